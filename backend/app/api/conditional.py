@@ -0,0 +1,55 @@
+import hashlib
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson when it is installed.
+    """
+
+    def render(self, content):
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+# Clients must revalidate, but may reuse the body on a 304
+CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts):
+    """
+    Build a weak ETag from the values a response is derived from.
+
+    Args:
+        *parts: Row versions, timestamps or ids; None is allowed.
+
+    Returns:
+        str: The quoted ETag, e.g. W/"3f2a...".
+    """
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def etag_matches(request: Request, etag: str):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" name the same representation
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+def conditional_response(request: Request, etag: str, build):
+    """
+    Answer 304 when the client already holds ``etag``; otherwise call
+    ``build()`` for the JSON-serializable content. The body is only built
+    when it is actually sent.
+    """
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(content=build(), headers=headers)
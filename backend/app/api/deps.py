@@ -2,28 +2,43 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from ..db.database import get_db_connection
 from ..schemas.schemas import UserWithAsthma, AsthmaFormData
+from ..core.cache import TTLCache
+from ..core.config import settings
 from ..core.security import verify_token
-import psycopg2
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Resolved principals keyed by token subject (email)
+user_cache = TTLCache(settings.USER_CACHE_MAX_SIZE, settings.USER_CACHE_TTL_SECONDS)
+
+def invalidate_user(email: str):
+    """
+    Drop a cached principal. Call this after writing anything that
+    get_current_user reads (asthma data, the disabled flag, profile fields).
+    """
+    user_cache.invalidate(email)
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     email = verify_token(token)
+
+    cached_user = user_cache.get(email)
+    if cached_user is not None:
+        return cached_user
     
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT 
-                u.id as user_id, u.username, u.email, u.disabled,
-                a.severity, a.symptoms, a.trigger_factors,
-                a.allergies, a.checkup_frequency, a.last_attack_date, a.report_pdf_url
-            FROM users u 
-            LEFT JOIN asthma_data a ON u.id = a.user_id 
-            WHERE u.email = %s
-        """, (email,))
+        async with get_db_connection() as conn:
+            user = await conn.fetchrow("""
+                SELECT 
+                    u.id as user_id, u.username, u.email, u.disabled,
+                    u.xmin::text as row_version, a.xmin::text as asthma_row_version,
+                    a.created_at as asthma_created_at,
+                    a.severity, a.symptoms, a.trigger_factors,
+                    a.allergies, a.checkup_frequency, a.last_attack_date, a.report_pdf_url
+                FROM users u 
+                LEFT JOIN asthma_data a ON u.id = a.user_id 
+                WHERE u.email = $1
+            """, email)
 
-        user = cur.fetchone()
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -52,19 +67,31 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
                 report_pdf_url=user_dict.get("report_pdf_url"),
             )
 
-        return UserWithAsthma(**user_base, asthma_data=asthma_data)
+        current_user = UserWithAsthma(
+            **user_base,
+            asthma_data=asthma_data,
+            row_version=user_dict.get("row_version"),
+            asthma_row_version=user_dict.get("asthma_row_version"),
+            asthma_created_at=user_dict.get("asthma_created_at"),
+        )
+        user_cache.set(email, current_user)
+        return current_user
+    except HTTPException:
+        # Includes the pool-exhausted 503; only a bad token or unknown user is a 401
+        raise
     except Exception as e:
         print(f"Error in get_current_user: {e}")
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not load user"
         )
-    finally:
-        cur.close()
-        conn.close()
 
 async def get_current_active_user(current_user: UserWithAsthma = Depends(get_current_user)):
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user 
\ No newline at end of file
+    return current_user 
+
+async def current_user_key(current_user: UserWithAsthma = Depends(get_current_active_user)):
+    # Rate-limit key for admit() on authenticated routes; FastAPI resolves
+    # the user once per request, so the endpoint reuses it
+    return f"user:{current_user.id}"
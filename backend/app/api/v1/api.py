@@ -1,9 +1,17 @@
 from fastapi import APIRouter
-from .endpoints import auth, users, asthma, recommend
+from .endpoints import auth, users, asthma, recommend, sensors, forecast, alerts, live, waqi, stations, system, admin
 
 api_router = APIRouter()
 
 api_router.include_router(auth.router, tags=["auth"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(asthma.router, tags=["asthma"])
-api_router.include_router(recommend.router, tags=["recommendations"]) 
\ No newline at end of file
+api_router.include_router(recommend.router, tags=["recommendations"])
+api_router.include_router(sensors.router, prefix="/sensors", tags=["sensors"])
+api_router.include_router(forecast.router, tags=["forecast"])
+api_router.include_router(alerts.router, tags=["alerts"])
+api_router.include_router(live.router, tags=["live"])
+api_router.include_router(waqi.router, prefix="/aqi", tags=["aqi"])
+api_router.include_router(stations.router, prefix="/stations", tags=["stations"])
+api_router.include_router(system.router, tags=["system"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
\ No newline at end of file
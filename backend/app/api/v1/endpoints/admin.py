@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from typing import Optional
+import hmac
+from ....core.config import settings
+from .recommend import recommendation_precompute
+
+router = APIRouter()
+
+async def verify_admin_key(x_admin_key: Optional[str] = Header(None)):
+    # Admin endpoints stay closed until a key is configured
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin API is disabled"
+        )
+    if not hmac.compare_digest(x_admin_key or "", settings.ADMIN_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin key"
+        )
+
+@router.post("/recommendations/precompute", status_code=202, dependencies=[Depends(verify_admin_key)])
+async def start_precompute(
+    force: bool = Query(False),
+    resume: bool = Query(True)
+):
+    """
+    Start a bulk recommendation precompute in the background of this worker.
+
+    Args:
+        force (bool): Regenerate even for users whose stored recommendation
+            still matches their inputs.
+        resume (bool): Continue the last interrupted run instead of starting over.
+
+    Returns:
+        dict: Acknowledgement; poll GET /admin/recommendations/precompute.
+    """
+    recommendation_precompute.start(force=force, resume=resume)
+    return {"status": "started", "force": force, "resume": resume}
+
+@router.get("/recommendations/precompute", dependencies=[Depends(verify_admin_key)])
+async def get_precompute_status():
+    """
+    Progress of the most recent precompute run.
+    """
+    run = await recommendation_precompute.latest_run()
+    if run is None:
+        raise HTTPException(status_code=404, detail="No precompute run found")
+    return {**run, "running_here": recommendation_precompute.running}
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends
+from ....core.alerts import alert_engine
+from ....db.database import get_db_connection
+from ....schemas.schemas import AlertDevices, UserWithAsthma
+from ...deps import get_current_active_user
+
+router = APIRouter()
+
+@router.get("/alerts/me")
+async def get_my_alerts(current_user: UserWithAsthma = Depends(get_current_active_user)):
+    """
+    Most recent air-quality alerts raised for the current user, newest first.
+    """
+    return {"alerts": alert_engine.recent(current_user.id)}
+
+@router.get("/alerts/devices", response_model=AlertDevices)
+async def get_alert_devices(current_user: UserWithAsthma = Depends(get_current_active_user)):
+    """
+    Devices the current user is alerted about.
+    """
+    async with get_db_connection() as conn:
+        rows = await conn.fetch(
+            "SELECT device_id FROM alert_devices WHERE user_id = $1 ORDER BY device_id",
+            current_user.id
+        )
+    return AlertDevices(device_ids=[row["device_id"] for row in rows])
+
+@router.put("/alerts/devices", response_model=AlertDevices)
+async def set_alert_devices(
+    devices: AlertDevices,
+    current_user: UserWithAsthma = Depends(get_current_active_user)
+):
+    """
+    Replace the devices the current user is alerted about. Readings of
+    other devices never alert this user.
+
+    Args:
+        devices (AlertDevices): The device ids to follow; empty stops alerts.
+
+    Returns:
+        AlertDevices: The stored device ids.
+    """
+    async with get_db_connection() as conn:
+        async with conn.transaction():
+            await conn.execute("DELETE FROM alert_devices WHERE user_id = $1", current_user.id)
+            await conn.execute(
+                """
+                INSERT INTO alert_devices (user_id, device_id)
+                SELECT $1, unnest($2::text[])
+                """,
+                current_user.id, devices.device_ids
+            )
+    alert_engine.set_devices(current_user.id, devices.device_ids)
+    return devices
@@ -1,49 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, status, UploadFile, File, Form
 from typing import Optional
 from datetime import datetime
 from ....db.database import get_db_connection
 from ....schemas.schemas import AsthmaFormData, AsthmaFormStatus, UserWithAsthma
 
-from ...deps import get_current_active_user
+from ....core.admission import admit
+from ....core.alerts import alert_engine
+from ....core.config import settings
+from ....core.ingestion import enqueue_report, knowledge_index
+from ....core.uploads import store_pdf
+from ...conditional import conditional_response, make_etag
+from ...deps import current_user_key, get_current_active_user, invalidate_user
+import asyncio
 import json
 import os
-import uuid
 
 router = APIRouter()
 
 @router.get("/asthma-form-status", response_model=AsthmaFormStatus)
-async def get_asthma_form_status(current_user: UserWithAsthma = Depends(get_current_active_user)):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        # Check if user has submitted asthma form data
-        cur.execute(
-            "SELECT created_at FROM asthma_data WHERE user_id = %s",
-            (current_user.id,)
-        )
-        result = cur.fetchone()
-        
-        if result:
-            return AsthmaFormStatus(
-                has_submitted=True,
-                last_updated=result['created_at']
-            )
-        else:
-            return AsthmaFormStatus(
-                has_submitted=False,
-                last_updated=None
-            )
-            
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=str(e)
-        )
-    finally:
-        cur.close()
-        conn.close()
+async def get_asthma_form_status(
+    request: Request,
+    current_user: UserWithAsthma = Depends(get_current_active_user)
+):
+    # The principal already carries the form row's version and created_at,
+    # so this needs no query and unchanged forms answer 304
+    etag = make_etag(current_user.id, current_user.asthma_row_version)
 
-@router.post("/asthma-form", response_model=AsthmaFormData)
+    def build():
+        last_updated = current_user.asthma_created_at
+        return {
+            "has_submitted": current_user.asthma_row_version is not None,
+            "last_updated": last_updated.isoformat() if last_updated else None,
+        }
+
+    return conditional_response(request, etag, build)
+
+@router.get("/asthma-report-status")
+async def get_asthma_report_status(
+    current_user: UserWithAsthma = Depends(get_current_active_user)
+):
+    """
+    Whether the user's uploaded report has been parsed and embedded yet.
+    """
+    report_pdf_url = current_user.asthma_data.report_pdf_url if current_user.asthma_data else None
+    if not report_pdf_url:
+        raise HTTPException(status_code=404, detail="No PDF report found for the user")
+
+    pdf_path = report_pdf_url.lstrip('/')
+    digest = os.path.splitext(os.path.basename(pdf_path))[0]
+    if os.path.basename(os.path.dirname(os.path.dirname(pdf_path))) != "sha256":
+        # Reports uploaded before content addressing are named by UUID
+        if not os.path.exists(pdf_path):
+            raise HTTPException(status_code=404, detail="PDF report file not found")
+        digest = await asyncio.to_thread(knowledge_index.digest_for, pdf_path)
+
+    state = await asyncio.to_thread(knowledge_index.status, digest) or {"status": "not_queued"}
+    return {"report_pdf_url": report_pdf_url, "digest": digest, **state}
+
+@router.post("/asthma-form", response_model=AsthmaFormData, dependencies=[Depends(admit("asthma_form", key=current_user_key))])
 async def submit_asthma_form(
     severity: str = Form(...),
     symptoms: str = Form(...),
@@ -54,8 +68,6 @@ async def submit_asthma_form(
     report_pdf: Optional[UploadFile] = File(None),
     current_user: UserWithAsthma = Depends(get_current_active_user)
 ):
-    conn = get_db_connection()
-    cur = conn.cursor()
     try:
         # Parse JSON strings to lists
         symptoms_list = json.loads(symptoms)
@@ -75,75 +87,53 @@ async def submit_asthma_form(
         
         # Handle PDF file upload
         report_pdf_url = None
+        report_digest = None
         if report_pdf:
-            # Create user-specific directory if it doesn't exist
-            user_dir = os.path.join("static", "asthma-reports", str(current_user.id))
-            os.makedirs(user_dir, exist_ok=True)
-            
-            # Generate unique filename
-            file_extension = os.path.splitext(report_pdf.filename)[1]
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = os.path.join(user_dir, unique_filename)
-            
-            # Save the file
-            with open(file_path, "wb") as buffer:
-                content = await report_pdf.read()
-                buffer.write(content)
+            file_path, report_digest, _ = await store_pdf(
+                report_pdf,
+                settings.REPORT_UPLOAD_DIR,
+                settings.REPORT_MAX_BYTES,
+                settings.UPLOAD_CHUNK_SIZE,
+            )
             
             # Generate URL for the file
-            report_pdf_url = f"/static/asthma-reports/{current_user.id}/{unique_filename}"
+            report_pdf_url = "/" + file_path.replace(os.sep, "/")
         
-        # Check if asthma data already exists for this user
-        cur.execute("SELECT * FROM asthma_data WHERE user_id = %s", (current_user.id,))
-        existing_data = cur.fetchone()
-        
-        if existing_data:
-            # Update existing asthma data
-            cur.execute(
-                """
-                UPDATE asthma_data 
-                SET severity = %s, symptoms = %s, trigger_factors = %s, 
-                    allergies = %s, checkup_frequency = %s, last_attack_date = %s,
-                    report_pdf_url = %s
-                WHERE user_id = %s
-                RETURNING *
-                """,
-                (
-                    severity,
-                    symptoms_list,
-                    trigger_factors_list,
-                    allergies_list,
-                    checkup_frequency,
-                    last_attack_date_obj,
-                    report_pdf_url,
-                    current_user.id
-                )
-            )
-        else:
-            # Insert new asthma data
-            cur.execute(
+        # Borrowed once the upload is stored, so slow clients hold no pooled
+        # connection; the unique index on user_id arbitrates concurrent submits
+        async with get_db_connection() as conn:
+            updated_data = await conn.fetchrow(
                 """
                 INSERT INTO asthma_data (
-                    user_id, severity, symptoms, trigger_factors, 
+                    user_id, severity, symptoms, trigger_factors,
                     allergies, checkup_frequency, last_attack_date, report_pdf_url
                 )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING *
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                ON CONFLICT (user_id) DO UPDATE
+                SET severity = EXCLUDED.severity, symptoms = EXCLUDED.symptoms,
+                    trigger_factors = EXCLUDED.trigger_factors, allergies = EXCLUDED.allergies,
+                    checkup_frequency = EXCLUDED.checkup_frequency,
+                    last_attack_date = EXCLUDED.last_attack_date,
+                    report_pdf_url = EXCLUDED.report_pdf_url
+                RETURNING severity, symptoms, trigger_factors, allergies,
+                    checkup_frequency, last_attack_date, report_pdf_url
                 """,
-                (
-                    current_user.id,
-                    severity,
-                    symptoms_list,
-                    trigger_factors_list,
-                    allergies_list,
-                    checkup_frequency,
-                    last_attack_date_obj,
-                    report_pdf_url
-                )
+                current_user.id,
+                severity,
+                symptoms_list,
+                trigger_factors_list,
+                allergies_list,
+                checkup_frequency,
+                last_attack_date_obj,
+                report_pdf_url
             )
         
-        updated_data = cur.fetchone()
-        conn.commit()
+        # The cached principal embeds asthma data, so drop it
+        invalidate_user(current_user.email)
+        alert_engine.set_user(current_user.id, severity)
+        if report_digest:
+            # Parse and embed now so recommendations only retrieve and generate
+            await enqueue_report(file_path, report_digest, owner_id=str(current_user.id))
         
         return AsthmaFormData(
             severity=updated_data['severity'],
@@ -160,12 +150,10 @@ async def submit_asthma_form(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid JSON format for symptoms, trigger_factors, or allergies"
         )
+    except HTTPException:
+        raise
     except Exception as e:
-        conn.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
-        )
-    finally:
-        cur.close()
-        conn.close() 
\ No newline at end of file
+        )
\ No newline at end of file
@@ -1,99 +1,96 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import timedelta
+from ....core.admission import admit
 from ....core.config import settings
-from ....core.security import verify_password, get_password_hash, create_access_token
+from ....core.security import verify_and_update_password, get_password_hash_async, create_access_token
 from ....db.database import get_db_connection
+from ....db.migrations import USERS_EMAIL_INDEX, USERS_USERNAME_INDEX
 from ....schemas.schemas import Token, User, UserCreate, LoginRequest
 from ...deps import get_current_active_user
+import asyncpg
 import uuid
 
 router = APIRouter()
 
-@router.post("/signup", response_model=User)
+@router.post("/signup", response_model=User, dependencies=[Depends(admit("signup"))])
 async def signup(user: UserCreate):
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
+    # Hash before borrowing a connection so bcrypt never holds a pool slot
+    hashed_password = await get_password_hash_async(user.password)
+    user_id = str(uuid.uuid4())
     try:
-        # Check if user already exists (by email or username)
-        cur.execute("SELECT * FROM users WHERE email = %s OR username = %s", 
-                   (user.email, user.username))
-        existing_user = cur.fetchone()
-        
-        if existing_user:
-            if existing_user['email'] == user.email:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Email already registered"
-                )
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Username already taken"
-                )
-        
-        # Create new user
-        hashed_password = get_password_hash(user.password)
-        user_id = str(uuid.uuid4())
-        
-        # Insert user data
-        cur.execute(
-            """
-            INSERT INTO users (id, username, email, hashed_password, disabled)
-            VALUES (%s, %s, %s, %s, %s)
-            RETURNING id, username, email, disabled
-            """,
-            (user_id, user.username, user.email, hashed_password, False)
-        )
-        new_user = cur.fetchone()
-        conn.commit()
+        # The unique indexes on email and username reject duplicates, so no
+        # pre-check is needed and concurrent signups cannot both succeed
+        async with get_db_connection() as conn:
+            new_user = await conn.fetchrow(
+                """
+                INSERT INTO users (id, username, email, hashed_password, disabled)
+                VALUES ($1, $2, $3, $4, $5)
+                RETURNING id, username, email, disabled
+                """,
+                user_id, user.username, user.email, hashed_password, False
+            )
         return User(**dict(new_user))
     
+    except asyncpg.UniqueViolationError as e:
+        if e.constraint_name == USERS_EMAIL_INDEX:
+            detail = "Email already registered"
+        elif e.constraint_name == USERS_USERNAME_INDEX:
+            detail = "Username already taken"
+        else:
+            print(f"Unexpected unique violation on signup: {e.constraint_name}")
+            detail = "User already exists"
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+    except HTTPException:
+        raise
     except Exception as e:
-        conn.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
-    finally:
-        cur.close()
-        conn.close()
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(admit("login"))])
 async def login(login_data: LoginRequest):
-    conn = get_db_connection()
-    cur = conn.cursor()
+    # Get user from database; the connection goes back before bcrypt runs
+    async with get_db_connection() as conn:
+        user = await conn.fetchrow(
+            "SELECT id, email, hashed_password FROM users WHERE email = $1", login_data.email
+        )
     
-    try:
-        # Get user from database
-        cur.execute("SELECT * FROM users WHERE email = %s", (login_data.email,))
-        user = cur.fetchone()
-        
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect email or password",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        if not verify_password(login_data.password, user['hashed_password']):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect email or password",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user['email']}, expires_delta=access_token_expires
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
         )
-        return {
-            "access_token": access_token, 
-            "token_type": "bearer",
-            "user_id": user['id']
-        }
     
-    finally:
-        cur.close()
-        conn.close() 
\ No newline at end of file
+    verified, new_hash = await verify_and_update_password(
+        login_data.password, user['hashed_password']
+    )
+    if not verified:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # Transparently upgrade hashes created with an older work factor
+    if new_hash:
+        try:
+            async with get_db_connection() as conn:
+                await conn.execute(
+                    "UPDATE users SET hashed_password = $1 WHERE id = $2",
+                    new_hash, user['id']
+                )
+        except Exception as e:
+            print(f"Error rehashing password: {e}")
+    
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": user['email']}, expires_delta=access_token_expires
+    )
+    return {
+        "access_token": access_token, 
+        "token_type": "bearer",
+        "user_id": user['id']
+    }
\ No newline at end of file
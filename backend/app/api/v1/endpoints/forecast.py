@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List
+import asyncio
+from ....core.config import settings
+from ....core.forecast import forecaster
+from ....db.database import get_db_connection
+from ....schemas.schemas import UserWithAsthma
+from ...deps import get_current_active_user
+
+router = APIRouter()
+
+@router.get("/forecast")
+async def get_forecast(
+    device_id: List[str] = Query(...),
+    steps: int = Query(12, ge=1),
+    current_user: UserWithAsthma = Depends(get_current_active_user)
+):
+    """
+    Recursive multi-pollutant forecast for one or more devices.
+
+    Devices whose cached forecast is still current (no reading since it was
+    computed) are answered from memory; the rest are forecast together in
+    one batched model call per step.
+
+    Args:
+        device_id (list): Devices to forecast (repeat the query parameter).
+        steps (int): Reporting intervals to forecast ahead.
+    """
+    if not forecaster.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Forecast model is not loaded"
+        )
+    if steps > settings.FORECAST_MAX_STEPS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"steps must be at most {settings.FORECAST_MAX_STEPS}"
+        )
+
+    device_ids = list(dict.fromkeys(device_id))
+    if len(device_ids) > settings.FORECAST_MAX_DEVICES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.FORECAST_MAX_DEVICES} devices per request"
+        )
+
+    forecasts = {}
+    pending = []
+    for d in device_ids:
+        cached = forecaster.cached(d, steps)
+        if cached is not None:
+            forecasts[d] = cached
+        else:
+            pending.append(d)
+
+    if pending:
+        async with get_db_connection() as conn:
+            ready_ids, history, last_seen = await forecaster.fetch_history(conn, pending)
+        if ready_ids:
+            # Model inference is CPU-bound; keep it off the event loop
+            forecasts.update(await asyncio.to_thread(
+                forecaster.predict, ready_ids, history, last_seen, steps
+            ))
+
+    return {
+        "steps": steps,
+        "forecasts": forecasts,
+        "insufficient_history": [d for d in device_ids if d not in forecasts],
+    }
@@ -0,0 +1,119 @@
+import asyncio
+import json
+from typing import List
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from ....core.broker import broker
+from ....core.config import settings
+from ...deps import get_current_user
+
+router = APIRouter()
+
+# Topics clients may subscribe to; alerts (user:<id>) are attached automatically
+TOPIC_PREFIXES = ("device:", "area:")
+
+def valid_topic(topic):
+    return isinstance(topic, str) and topic.startswith(TOPIC_PREFIXES) and len(topic) <= 128
+
+async def authenticate(token):
+    """
+    Resolve a bearer token to an active user; browsers cannot set headers on
+    WebSocket or EventSource requests, so the token comes in the query string.
+    """
+    user = await get_current_user(token)
+    if user.disabled:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
+
+def open_subscription(user, topics):
+    subscription = broker.connect()
+    broker.subscribe(subscription, f"user:{user.id}")
+    rejected = [t for t in topics if not (valid_topic(t) and broker.subscribe(subscription, t))]
+    return subscription, rejected
+
+@router.websocket("/live/ws")
+async def live_websocket(websocket: WebSocket, token: str = Query(...)):
+    """
+    Push live readings and the user's alerts over a WebSocket.
+
+    Clients send {"action": "subscribe" | "unsubscribe", "topics": [...]}
+    with topics like "device:<device_id>" or "area:<geohash>"; the server
+    sends {"type": "reading" | "alert" | "ack", "data": ...}.
+    """
+    try:
+        user = await authenticate(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription, _ = open_subscription(user, [])
+
+    async def send_loop():
+        while True:
+            await websocket.send_text(await subscription.next_message())
+
+    sender = asyncio.create_task(send_loop())
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                action = message.get("action")
+                topics = message.get("topics") or []
+            except (ValueError, AttributeError):
+                await websocket.send_json({"type": "error", "data": "Invalid message"})
+                continue
+
+            if action == "subscribe":
+                rejected = [t for t in topics if not (valid_topic(t) and broker.subscribe(subscription, t))]
+            elif action == "unsubscribe":
+                for topic in topics:
+                    if valid_topic(topic):
+                        broker.unsubscribe(subscription, topic)
+                rejected = []
+            else:
+                await websocket.send_json({"type": "error", "data": f"Unknown action: {action}"})
+                continue
+            await websocket.send_json({
+                "type": "ack",
+                "data": {"topics": sorted(subscription.topics), "rejected": rejected},
+            })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+        broker.disconnect(subscription)
+
+@router.get("/live/stream")
+async def live_stream(token: str = Query(...), topic: List[str] = Query([])):
+    """
+    Server-Sent Events variant of /live/ws for clients without WebSockets.
+    Topics are fixed for the lifetime of the stream.
+    """
+    user = await authenticate(token)
+    subscription, rejected = open_subscription(user, topic)
+    if rejected:
+        broker.disconnect(subscription)
+        raise HTTPException(status_code=400, detail=f"Invalid topics: {', '.join(map(str, rejected))}")
+
+    async def events():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        subscription.next_message(), settings.LIVE_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            broker.disconnect(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
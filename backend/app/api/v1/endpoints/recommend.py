@@ -1,92 +1,317 @@
-from fastapi import APIRouter, HTTPException, Form
+from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import asyncio
+import json
+import threading
+import time
 from pydantic import BaseModel
-from ....core.recommendation import DatabaseManager
-from agno.embedder.google import GeminiEmbedder
-from agno.models.google import Gemini
-from agno.agent import Agent, RunResponse
-from agno.vectordb.lancedb import LanceDb, SearchType
-from agno.knowledge.pdf import PDFKnowledgeBase, PDFReader
+from ....core.admission import admit
+from ....core.config import settings
+from ....core.recommendation import DatabaseManager, recommendation_cache, recommendation_fingerprint
+from ....core.ingestion import knowledge_index
+from ....core.jobs import JobQueue
+from ....core.metrics import span
+from ....core.precompute import RecommendationPrecompute
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-os.environ['GOOGLE_API_KEY'] = os.getenv('GOOGLE_API_KEY')
 
 router = APIRouter()
 
 # Initialize the DatabaseManager
 db_manager = DatabaseManager()
-embeddings = GeminiEmbedder()
-
-# Create a directory for LanceDB in the backend folder
-lancedb_dir = os.path.join(os.getcwd(), "lancedb_data")
-os.makedirs(lancedb_dir, exist_ok=True)
 
 class RecommendationRequest(BaseModel):
     user_id: int
 
-@router.post("/get_recommendations")
-async def get_recommendations(user_id: str = Form(...)):
+async def load_recommendation_inputs(user_id, refresh=False, device_id=None):
     """
-    Fetch the latest user record and generate recommendations.
+    Fetch the latest user record and look up a cached recommendation.
 
     Args:
-        user_id (int): The ID of the user (sent as form-data).
+        user_id (str): The ID of the user.
+        refresh (bool): Skip the recommendation cache.
+        device_id (str, optional): Device whose latest reading to use.
+
+    Returns:
+        tuple: (user_record, fingerprint, cached) where cached is the cached
+        response or None.
+    """
+    # Fetch the latest user record
+    user_record = await db_manager.fetch_latest_user_record(user_id, device_id=device_id)
+    print("user_record", user_record)
+
+    if not user_record:
+        raise HTTPException(status_code=404, detail="No record found for the given user_id")
+
+    # Reuse the last answer while the profile and pollutant bands are unchanged
+    fingerprint = recommendation_fingerprint(user_id, user_record)
+    cached = None
+    if settings.RECOMMENDATION_CACHE_ENABLED and not refresh:
+        recommendations = recommendation_cache.get(fingerprint)
+        if recommendations is None and user_record.get("stored_fingerprint") == fingerprint:
+            # Precomputed by a bulk run for exactly these inputs
+            recommendations = user_record["stored_recommendations"]
+            recommendation_cache.set(fingerprint, recommendations)
+        if recommendations is not None:
+            cached = {"user_id": user_id, "recommendations": recommendations, "cached": True}
+    return user_record, fingerprint, cached
+
+def pollutant_levels(user_record):
+    # Extract sensor data
+    sensor_data = user_record.get("sensor_data") or {}
+    return {
+        "pm1_0": sensor_data.get("pm1_0"),
+        "pm2_5": sensor_data.get("pm2_5"),
+        "pm10": sensor_data.get("pm10"),
+        "no2": sensor_data.get("no2"),
+    }
+
+def resolve_report_path(user_record):
+    """
+    Map the record's report_pdf_url to the PDF on disk.
+
+    Returns:
+        str: Absolute path of the patient's report.
+    """
+    # Get PDF file path from the report_pdf_url in the database
+    report_pdf_url = user_record.get("report_pdf_url")
+    print("report_pdf_url from db:", report_pdf_url)
+    
+    if not report_pdf_url:
+        raise HTTPException(status_code=404, detail="No PDF report found for the user")
+    
+    # Convert URL to file path
+    # The URL is in format /static/asthma-reports/{user_id}/{filename}.pdf
+    # We need to remove the leading slash and use proper path joining
+    relative_path = report_pdf_url.lstrip('/')
+    pdf_path = os.path.join(os.getcwd(), relative_path)
+    print("Constructed pdf_path:", pdf_path)
+    
+    if not os.path.exists(pdf_path):
+        print(f"File not found at path: {pdf_path}")
+        raise HTTPException(status_code=404, detail="PDF report file not found")
+    return pdf_path
+
+async def generate_recommendations(user_id, user_record, fingerprint):
+    """
+    Job handler: resolve the patient's report and run the model.
+
+    Args:
+        user_id (str): The ID of the user.
+        user_record (dict): The record returned by fetch_latest_user_record.
+        fingerprint (str): Cache key for the generated recommendation.
 
     Returns:
         dict: The recommendations based on the user's latest record.
     """
-    try:
-        # Fetch the latest user record
-        user_record = db_manager.fetch_latest_user_record(user_id)
-        print("user_record", user_record)
-
-        if not user_record:
-            raise HTTPException(status_code=404, detail="No record found for the given user_id")
-
-        # Extract sensor data
-        sensor_data = user_record.get("sensor_data", {})
-        pm1_0 = sensor_data.get("pm1_0")
-        pm2_5 = sensor_data.get("pm2_5")
-        pm10 = sensor_data.get("pm10")
-        no2 = sensor_data.get("no2")
-
-        # Get PDF file path from the report_pdf_url in the database
-        report_pdf_url = user_record.get("report_pdf_url")
-        print("report_pdf_url from db:", report_pdf_url)
-        
-        if not report_pdf_url:
-            raise HTTPException(status_code=404, detail="No PDF report found for the user")
-        
-        # Convert URL to file path
-        # The URL is in format /static/asthma-reports/{user_id}/{filename}.pdf
-        # We need to remove the leading slash and use proper path joining
-        relative_path = report_pdf_url.lstrip('/')
-        pdf_path = os.path.join(os.getcwd(), relative_path)
-        print("Constructed pdf_path:", pdf_path)
-        
-        if not os.path.exists(pdf_path):
-            print(f"File not found at path: {pdf_path}")
-            print(f"Current working directory: {os.getcwd()}")
-            print(f"Directory contents: {os.listdir(os.path.dirname(pdf_path))}")
-            raise HTTPException(status_code=404, detail="PDF report file not found")
-
-        # Call the get_recommendation function
-        recommendations = get_recommendation(
+    pdf_path = resolve_report_path(user_record)
+
+    # The agent is blocking; run it in a thread and cap concurrent model calls
+    async with model_slots:
+        recommendations = await asyncio.to_thread(
+            get_recommendation,
             user_record=user_record,
             pdf_path=pdf_path,
-            pm1_0=pm1_0,
-            pm2_5=pm2_5,
-            pm10=pm10,
-            no2=no2
+            user_id=user_id,
+            **pollutant_levels(user_record)
         )
 
-        return {"user_id": user_id, "recommendations": recommendations}
+    if settings.RECOMMENDATION_CACHE_ENABLED:
+        recommendation_cache.set(fingerprint, recommendations)
+
+    return {"user_id": user_id, "recommendations": recommendations, "cached": False}
+
+# Background generation: concurrent requests for one user share a single job
+recommendation_jobs = JobQueue(
+    handler=generate_recommendations,
+    workers=settings.RECOMMENDATION_WORKERS,
+    max_queue_size=settings.RECOMMENDATION_QUEUE_MAX_SIZE,
+    result_ttl=settings.RECOMMENDATION_JOB_TTL_SECONDS,
+)
+model_slots = asyncio.Semaphore(settings.RECOMMENDATION_MODEL_CONCURRENCY)
+
+# Bulk generation for every profile; calls the handler directly so it never
+# fills the interactive job queue
+recommendation_precompute = RecommendationPrecompute(
+    generate=generate_recommendations,
+    page_size=settings.PRECOMPUTE_PAGE_SIZE,
+    concurrency=settings.PRECOMPUTE_CONCURRENCY,
+    max_attempts=settings.PRECOMPUTE_MAX_ATTEMPTS,
+    backoff_seconds=settings.PRECOMPUTE_BACKOFF_SECONDS,
+)
+
+@router.post("/get_recommendations", dependencies=[Depends(admit("recommendations"))])
+async def get_recommendations(
+    user_id: str = Form(...),
+    refresh: bool = Form(False),
+    device_id: Optional[str] = Form(None)
+):
+    """
+    Fetch the latest user record and generate recommendations, waiting for
+    the result. Generation goes through the job queue, so it is coalesced
+    and bounded exactly like /recommendation-jobs.
+
+    Args:
+        user_id (int): The ID of the user (sent as form-data).
+        refresh (bool): Skip the recommendation cache and ask the model again.
+        device_id (str, optional): Device whose latest reading to use; defaults
+            to the freshest reading across all devices.
+
+    Returns:
+        dict: The recommendations based on the user's latest record.
+    """
+    try:
+        user_record, fingerprint, cached = await load_recommendation_inputs(user_id, refresh, device_id)
+        if cached is not None:
+            return cached
+
+        job = recommendation_jobs.submit(
+            (user_id, device_id), user_id=user_id, user_record=user_record, fingerprint=fingerprint
+        )
+        return await recommendation_jobs.wait(job)
+    except HTTPException:
+        raise
     except Exception as e:
         print("Error", e)
         raise HTTPException(status_code=500, detail=f"An error occurred: {e}")
 
-def get_recommendation(user_record, pdf_path, pm1_0, pm2_5, pm10, no2):
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/get_recommendations/stream", dependencies=[Depends(admit("recommendations"))])
+async def stream_recommendations(
+    user_id: str = Form(...),
+    refresh: bool = Form(False),
+    device_id: Optional[str] = Form(None)
+):
+    """
+    Stream recommendations as Server-Sent Events while the model generates
+    them. Emits ``chunk`` events with partial text, then ``done`` with the
+    full text, or ``error``. If the client disconnects, the underlying run
+    is stopped at the next chunk.
+
+    Args:
+        user_id (str): The ID of the user (sent as form-data).
+        refresh (bool): Skip the recommendation cache and ask the model again.
+        device_id (str, optional): Device whose latest reading to use; defaults
+            to the freshest reading across all devices.
+    """
+    user_record, fingerprint, cached = await load_recommendation_inputs(user_id, refresh, device_id)
+    if cached is None:
+        pdf_path = resolve_report_path(user_record)
+
+    async def events():
+        if cached is not None:
+            yield sse_event("done", cached)
+            return
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def publish(kind, payload):
+            if not cancelled.is_set():
+                loop.call_soon_threadsafe(queue.put_nowait, (kind, payload))
+
+        def produce():
+            # Runs in a worker thread; the agent's stream is a blocking iterator
+            try:
+                chunks = get_recommendation(
+                    user_record=user_record,
+                    pdf_path=pdf_path,
+                    user_id=user_id,
+                    stream=True,
+                    **pollutant_levels(user_record)
+                )
+                try:
+                    for chunk in chunks:
+                        if cancelled.is_set():
+                            break
+                        publish("chunk", chunk)
+                finally:
+                    close = getattr(chunks, "close", None)
+                    if close is not None:
+                        close()
+                publish("done", None)
+            except Exception as e:
+                publish("error", e)
+
+        # The permit follows the producer thread, not this generator: after a
+        # disconnect the thread can still be inside a model call
+        await model_slots.acquire()
+        producer = loop.run_in_executor(None, produce)
+        producer.add_done_callback(lambda _: model_slots.release())
+        parts = []
+        try:
+            while True:
+                kind, payload = await queue.get()
+                if kind == "chunk":
+                    parts.append(payload)
+                    yield sse_event("chunk", {"text": payload})
+                elif kind == "error":
+                    print("Error", payload)
+                    yield sse_event("error", {"detail": f"An error occurred: {payload}"})
+                    break
+                else:
+                    recommendations = "".join(parts)
+                    if settings.RECOMMENDATION_CACHE_ENABLED:
+                        recommendation_cache.set(fingerprint, recommendations)
+                    yield sse_event("done", {
+                        "user_id": user_id,
+                        "recommendations": recommendations,
+                        "cached": False,
+                    })
+                    break
+        finally:
+            # Starlette cancels this generator when the client goes away;
+            # tell the producer to stop pulling tokens from the model
+            cancelled.set()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post(
+    "/recommendation-jobs",
+    status_code=202,
+    dependencies=[Depends(admit("recommendations"))],
+)
+async def create_recommendation_job(
+    user_id: str = Form(...),
+    refresh: bool = Form(False),
+    device_id: Optional[str] = Form(None)
+):
+    """
+    Queue recommendation generation and return immediately.
+
+    Args:
+        user_id (str): The ID of the user (sent as form-data).
+        refresh (bool): Skip the recommendation cache and ask the model again.
+        device_id (str, optional): Device whose latest reading to use; defaults
+            to the freshest reading across all devices.
+
+    Returns:
+        dict: The job id and status; poll /recommendation-jobs/{job_id}.
+    """
+    user_record, fingerprint, cached = await load_recommendation_inputs(user_id, refresh, device_id)
+    if cached is not None:
+        return recommendation_jobs.completed((user_id, device_id), cached).to_dict()
+
+    job = recommendation_jobs.submit(
+        (user_id, device_id), user_id=user_id, user_record=user_record, fingerprint=fingerprint
+    )
+    return job.to_dict()
+
+@router.get("/recommendation-jobs/{job_id}")
+async def get_recommendation_job(job_id: str):
+    job = recommendation_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_dict()
+
+def get_recommendation(user_record, pdf_path, pm1_0, pm2_5, pm10, no2, user_id=None, stream=False):
     """
     Extract each column from the user record and implement recommendation logic.
 
@@ -94,6 +319,8 @@ def get_recommendation(user_record, pdf_path, pm1_0, pm2_5, pm10, no2):
         user_record (dict): The latest user record.
         pdf_path (str): Path to the PDF file in static directory.
         pm1_0, pm2_5, pm10, no2: Pollutant levels from sensor data.
+        user_id (str, optional): Owner of the report, recorded in the knowledge index.
+        stream (bool): Return an iterator of text chunks instead of the full text.
 
     Returns:
         dict: Recommendations based on the user record and the PDF file.
@@ -107,9 +334,11 @@ def get_recommendation(user_record, pdf_path, pm1_0, pm2_5, pm10, no2):
     checkup_date = user_record.get("checkup_date")
     last_attack_date = user_record.get("last_attack_date")
 
-    # Call the AI agent
-    response = ai_agent(
+    # Call the AI agent (or the offline stand-in for local runs)
+    agent_fn = stub_agent if settings.RECOMMENDATION_AGENT == "stub" else ai_agent
+    response = agent_fn(
         pdf_path=pdf_path,
+        user_id=user_id,
         severity=severity,
         symptoms=symptoms,
         trigger_factors=trigger_factors,
@@ -120,36 +349,39 @@ def get_recommendation(user_record, pdf_path, pm1_0, pm2_5, pm10, no2):
         pm1_0=pm1_0,
         pm2_5=pm2_5,
         pm10=pm10,
-        no2=no2
+        no2=no2,
+        stream=stream
     )
 
     return response
 
-def ai_agent(pdf_path, severity, symptoms, trigger_factors, report_pdf_url, allergies, checkup_date, last_attack_date, pm1_0, pm2_5, pm10, no2):
+def _timed_stream(chunks):
+    # The span covers the whole generation, from first request to last token
+    with span("generation"):
+        for chunk in chunks:
+            if chunk.content:
+                yield chunk.content
+
+def ai_agent(pdf_path, severity, symptoms, trigger_factors, report_pdf_url, allergies, checkup_date, last_attack_date, pm1_0, pm2_5, pm10, no2, user_id=None, stream=False):
+    # Imported here so workers and tools that never call the model skip the AI stack
+    from agno.agent import Agent, RunResponse
+    from agno.models.google import Gemini
+
+    with span("knowledge_load"):
+        knowledge = knowledge_index.get_knowledge_base(pdf_path, owner_id=user_id)
+
     # Initialize the AGNO Agent
     agent = Agent(
-        model=Gemini(id="gemini-1.5-flash"),
+        model=Gemini(id="gemini-1.5-flash", api_key=settings.GOOGLE_API_KEY),
         instructions="""You are an expert recommender for asthma patients. You are given a PDF file of an asthma patient's 
         report and live air pollutant data. Based on the patient's report and pollutant readings, provide personalized recommendations.""",
-        knowledge=PDFKnowledgeBase(
-            path=pdf_path,
-            vector_db=LanceDb(
-                uri=lancedb_dir,  # Use the created directory
-                table_name="documents",
-                search_type=SearchType.hybrid,
-                embedder=embeddings,
-            ),
-            reader=PDFReader(chunk=True),
-        ),
+        # Reports are embedded at upload time; this only embeds one that isn't ready yet
+        knowledge=knowledge,
         show_tool_calls=True,
         markdown=True,
         add_references=True,
     )
 
-    # Load the knowledge base if available
-    if agent.knowledge is not None:
-        agent.knowledge.load()
-
     # Define the query for the agent
     query = f"""This is some basic information about the patient:
     Severity: {severity}
@@ -164,8 +396,34 @@ def ai_agent(pdf_path, severity, symptoms, trigger_factors, report_pdf_url, alle
     The recommendations should be short and crisp.
     Give RECOMMENDATIONS IN 2 LINES IT should include based on the current pollutant levels these and as you have these problems you should do this."""
 
+    # Streaming runs yield partial RunResponses as the model produces tokens
+    if stream:
+        return _timed_stream(agent.run(query, stream=True))
+
     # Run the agent with the query
-    response: RunResponse = agent.run(query, stream=False)
+    with span("generation"):
+        response: RunResponse = agent.run(query, stream=False)
 
     # Return the agent's response
-    return response.content 
\ No newline at end of file
+    return response.content
+
+def stub_agent(pdf_path, severity, symptoms, trigger_factors, report_pdf_url, allergies, checkup_date, last_attack_date, pm1_0, pm2_5, pm10, no2, user_id=None, stream=False):
+    """
+    Offline stand-in for ai_agent used when RECOMMENDATION_AGENT=stub. It
+    sleeps for STUB_AGENT_LATENCY_SECONDS to mimic a model round trip and
+    never touches Gemini or the knowledge index.
+    """
+    text = (
+        f"Current levels are PM2.5 {pm2_5}, PM10 {pm10}, NO2 {no2}.\n"
+        f"With {severity} asthma, limit outdoor exposure and keep your reliever inhaler at hand."
+    )
+    if not stream:
+        time.sleep(settings.STUB_AGENT_LATENCY_SECONDS)
+        return text
+
+    def chunks():
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(settings.STUB_AGENT_LATENCY_SECONDS / len(words))
+            yield word if i == 0 else f" {word}"
+    return chunks()
@@ -0,0 +1,150 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+import hmac
+from ....core.config import settings
+from ....core.rollups import update_rollups, fetch_history
+from ....core.latest import latest_readings, store_latest, READING_FIELDS
+from ....core.alerts import alert_engine
+from ....db.database import get_db
+from ....schemas.schemas import SensorBatch, SensorIngestResult, UserWithAsthma
+from ...deps import get_current_active_user
+
+router = APIRouter()
+
+# Column order used for COPY into sensor_data
+SENSOR_COLUMNS = ["device_id", "timestamp", "pm1_0", "pm2_5", "pm10", "no2", "latitude", "longitude"]
+
+async def verify_ingest_key(x_api_key: Optional[str] = Header(None)):
+    # Like the admin API, ingestion stays closed until a key is configured
+    if not settings.SENSOR_INGEST_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Sensor ingestion is disabled"
+        )
+    if not hmac.compare_digest(x_api_key or "", settings.SENSOR_INGEST_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid ingestion key"
+        )
+
+def to_record(reading):
+    # SensorReading has already made the timestamp timezone-aware
+    return (
+        reading.device_id,
+        reading.timestamp,
+        reading.pm1_0,
+        reading.pm2_5,
+        reading.pm10,
+        reading.no2,
+        reading.latitude,
+        reading.longitude,
+    )
+
+@router.post("/readings", response_model=SensorIngestResult, dependencies=[Depends(verify_ingest_key)])
+async def ingest_readings(
+    batch: SensorBatch,
+    idempotency_key: Optional[str] = Header(None),
+    conn=Depends(get_db)
+):
+    """
+    Store a batch of sensor readings in one transaction using COPY.
+
+    Args:
+        batch (SensorBatch): Readings from one or more devices.
+        idempotency_key (str, optional): ``Idempotency-Key`` header. A batch
+            retried with the same key is acknowledged without being stored
+            twice; keys are kept for SENSOR_IDEMPOTENCY_RETENTION_HOURS.
+
+    Returns:
+        SensorIngestResult: Number of readings accepted and whether the batch
+        was a duplicate of one already stored.
+    """
+    if len(batch.readings) > settings.SENSOR_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {settings.SENSOR_BATCH_MAX_SIZE} readings"
+        )
+
+    records = [to_record(reading) for reading in batch.readings]
+
+    async with conn.transaction():
+        if idempotency_key:
+            # Claim the key first; a conflict means this batch was already stored
+            claimed = await conn.fetchval(
+                """
+                INSERT INTO sensor_ingest_batches (idempotency_key, reading_count)
+                VALUES ($1, $2)
+                ON CONFLICT (idempotency_key) DO NOTHING
+                RETURNING idempotency_key
+                """,
+                idempotency_key, len(records)
+            )
+            if claimed is None:
+                stored_count = await conn.fetchval(
+                    "SELECT reading_count FROM sensor_ingest_batches WHERE idempotency_key = $1",
+                    idempotency_key
+                )
+                return SensorIngestResult(accepted=stored_count, duplicate=True)
+
+        await conn.copy_records_to_table(
+            "sensor_data", records=records, columns=SENSOR_COLUMNS
+        )
+        await update_rollups(conn, records)
+        await store_latest(conn, records)
+
+    # Publish to the in-process index only once the batch is committed
+    updated = latest_readings.update([dict(zip(READING_FIELDS, record)) for record in records])
+    # Alert on each device's newest reading; backfilled history does not alert
+    alert_engine.evaluate(updated)
+
+    return SensorIngestResult(accepted=len(records))
+
+@router.get("/latest")
+async def get_latest_readings(device_id: Optional[str] = None):
+    """
+    Latest reading per device from the in-memory index, each with
+    ``age_seconds`` and a ``stale`` flag once a device has missed
+    SENSOR_STALE_AFTER_INTERVALS reporting intervals.
+
+    Args:
+        device_id (str, optional): Return only this device's reading.
+    """
+    if device_id is not None:
+        reading = latest_readings.get(device_id)
+        if reading is None:
+            raise HTTPException(status_code=404, detail="No readings for this device")
+        return reading
+    return {"readings": latest_readings.all()}
+
+def as_utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+@router.get("/history")
+async def get_sensor_history(
+    device_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_points: int = Query(500, ge=1, le=5000),
+    current_user: UserWithAsthma = Depends(get_current_active_user),
+    conn=Depends(get_db)
+):
+    """
+    Pollutant history for one device, served from the coarsest data needed:
+    raw readings for short windows, otherwise the finest rollup (1m, 1h, 1d)
+    that fits within max_points.
+
+    Args:
+        device_id (str): The device to query.
+        start (datetime, optional): Window start, defaults to 24 hours before end.
+        end (datetime, optional): Window end, defaults to now.
+        max_points (int): Upper bound on the number of points returned.
+    """
+    end = as_utc(end) if end else datetime.now(timezone.utc)
+    start = as_utc(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    return await fetch_history(conn, device_id, start, end, max_points)
@@ -0,0 +1,41 @@
+from typing import Optional
+from fastapi import APIRouter, Query
+from ....core.config import settings
+from ....core.spatial import cluster_points, station_index
+
+router = APIRouter()
+
+@router.get("/nearest")
+async def get_nearest_stations(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    k: int = Query(5, ge=1, le=settings.STATION_NEAREST_MAX_K),
+    max_km: Optional[float] = Query(None, gt=0)
+):
+    """
+    The k stations (our devices and known WAQI stations) closest to a
+    coordinate, nearest first.
+    """
+    return {"stations": station_index.nearest(lat, lng, k, max_km)}
+
+@router.get("/bounds")
+async def get_stations_in_bounds(
+    lat1: float = Query(..., ge=-90, le=90),
+    lng1: float = Query(..., ge=-180, le=180),
+    lat2: float = Query(..., ge=-90, le=90),
+    lng2: float = Query(..., ge=-180, le=180),
+    max_points: int = Query(settings.STATION_MAX_POINTS, ge=1, le=settings.STATION_MAX_POINTS)
+):
+    """
+    Stations inside a bounding box. When more than ``max_points`` fall in
+    the box (zoomed-out maps) they are returned as clusters instead.
+    """
+    south, north = sorted((lat1, lat2))
+    west, east = sorted((lng1, lng2))
+    points = station_index.within(south, west, north, east)
+    if len(points) <= max_points:
+        return {"count": len(points), "stations": points}
+    return {
+        "count": len(points),
+        "clusters": cluster_points(points, south, west, north, east, settings.STATION_CLUSTER_GRID),
+    }
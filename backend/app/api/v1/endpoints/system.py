@@ -0,0 +1,76 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from ....core.broker import broker
+from ....core.config import settings
+from ....core.ingestion import report_ingestion
+from ....core.latest import latest_readings
+from ....core.metrics import registry
+from ....core.recommendation import recommendation_cache
+from ....core.spatial import station_index
+from ....core.waqi import waqi_proxy
+from ....db import database
+from ...deps import user_cache
+from .recommend import recommendation_jobs
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _pool_connections():
+    pool = database.db_pool
+    if pool is None:
+        return {}
+    size, idle = pool.get_size(), pool.get_idle_size()
+    return {("idle",): idle, ("in_use",): size - idle}
+
+registry.gauge(
+    "db_pool_connections", "Open database connections by state.", _pool_connections, ("state",)
+)
+registry.gauge(
+    "job_queue_depth",
+    "Jobs waiting for a worker.",
+    lambda: {
+        ("recommendation",): recommendation_jobs.depth(),
+        ("ingestion",): report_ingestion.depth(),
+    },
+    ("queue",),
+)
+registry.gauge(
+    "cache_entries",
+    "Entries held by the in-process caches.",
+    lambda: {
+        ("principal",): len(user_cache),
+        ("recommendation",): len(recommendation_cache),
+        ("latest_readings",): len(latest_readings),
+        ("station_index",): len(station_index),
+    },
+    ("cache",),
+)
+registry.gauge("live_connections", "Open live-push connections.", lambda: broker.stats()["connections"])
+
+@router.get("/cache-stats")
+async def get_cache_stats():
+    """
+    Report hit/miss counters and occupancy of the in-process caches.
+    """
+    return {
+        "principal": user_cache.stats(),
+        "recommendation": recommendation_cache.stats(),
+        "waqi": waqi_proxy.stats(),
+    }
+
+@router.get("/live-stats")
+async def get_live_stats():
+    """
+    Report open live-push connections, active topics and dropped messages.
+    """
+    return broker.stats()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Expose request, query, span and resource metrics in the Prometheus text format.
+    """
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
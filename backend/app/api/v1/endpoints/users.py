@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from ....schemas.schemas import UserWithAsthma
+from ...conditional import conditional_response, make_etag
 from ...deps import get_current_active_user
 
 router = APIRouter()
 
 @router.get("/me", response_model=UserWithAsthma)
-async def read_users_me(current_user: UserWithAsthma = Depends(get_current_active_user)):
-    return current_user 
\ No newline at end of file
+async def read_users_me(
+    request: Request,
+    current_user: UserWithAsthma = Depends(get_current_active_user)
+):
+    # The app refetches this on every screen focus; unchanged rows answer 304
+    etag = make_etag(current_user.id, current_user.row_version, current_user.asthma_row_version)
+    return conditional_response(request, etag, lambda: current_user.model_dump(mode="json"))
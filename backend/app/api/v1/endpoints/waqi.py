@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Query
+from ....core.waqi import waqi_proxy
+
+router = APIRouter()
+
+@router.get("/feed/geo")
+async def get_nearest_feed(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180)
+):
+    """
+    AQI feed of the station nearest to a coordinate.
+    """
+    return {"data": await waqi_proxy.nearest(lat, lng)}
+
+@router.get("/feed/station/{station_id}")
+async def get_station_feed(station_id: int):
+    """
+    AQI feed of one WAQI station by its uid.
+    """
+    return {"data": await waqi_proxy.station(station_id)}
+
+@router.get("/bounds")
+async def get_stations_in_bounds(
+    lat1: float = Query(..., ge=-90, le=90),
+    lng1: float = Query(..., ge=-180, le=180),
+    lat2: float = Query(..., ge=-90, le=90),
+    lng2: float = Query(..., ge=-180, le=180)
+):
+    """
+    Stations and their current AQI inside a bounding box.
+    """
+    return {"data": await waqi_proxy.bounds(lat1, lng1, lat2, lng2)}
+
+@router.get("/search")
+async def search_stations(keyword: str = Query(..., min_length=1, max_length=100)):
+    """
+    Stations matching a place name.
+    """
+    return {"data": await waqi_proxy.search(keyword)}
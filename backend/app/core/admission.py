@@ -0,0 +1,237 @@
+import asyncio
+import ipaddress
+import math
+import threading
+import time
+from collections import OrderedDict
+from fastapi import Depends, HTTPException, Request, status
+from .config import settings
+from .metrics import registry
+
+admission_rejections = registry.counter(
+    "admission_rejections_total", "Requests shed by admission control.", ("route", "reason")
+)
+
+class TokenBuckets:
+    """
+    Per-key token buckets refilled lazily on access, so each check is O(1)
+    and idle keys cost nothing until they are evicted.
+
+    Args:
+        rate (float): Tokens added per second.
+        burst (int): Bucket capacity; also the number of back-to-back
+            requests a fresh key may make.
+        max_keys (int): Buckets kept before the least recently used one is
+            evicted. An evicted key starts over with a full bucket.
+    """
+
+    def __init__(self, rate, burst, max_keys):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> (tokens, updated_at)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """
+        Spend one token for ``key``.
+
+        Returns:
+            float: 0 if the request is admitted, otherwise the seconds until
+            a token becomes available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+class ConcurrencyLimit:
+    """
+    Semaphore with a bounded wait queue: requests beyond ``limit`` wait up
+    to ``timeout`` seconds, and are refused at once when ``max_waiting``
+    requests are already waiting.
+    """
+
+    def __init__(self, limit, max_waiting, timeout):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self):
+        """
+        Returns:
+            str: None once a slot is held, otherwise the rejection reason
+            ("queue_full" or "timeout").
+        """
+        if not self._semaphore.locked():
+            # A free slot is taken without suspending, so the count stays exact
+            await self._semaphore.acquire()
+        elif self.waiting >= self.max_waiting:
+            return "queue_full"
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                return "timeout"
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        return None
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+class AdmissionPolicy:
+    """
+    Admission rules of one route group, built from settings.ADMISSION_LIMITS.
+
+    Args:
+        name (str): Route group, used in metrics and logs.
+        concurrency (int): Requests served at once; 0 disables the limit.
+        queue (int): Requests allowed to wait for a slot.
+        timeout (float): Seconds a request may wait for a slot.
+        rate (float): Sustained requests per second per key; 0 disables
+            rate limiting.
+        burst (int): Requests a key may make back to back.
+    """
+
+    def __init__(self, name, concurrency=0, queue=0, timeout=5.0, rate=0.0, burst=1):
+        self.name = name
+        self.timeout = timeout
+        self.slots = ConcurrencyLimit(concurrency, queue, timeout) if concurrency > 0 else None
+        self.buckets = TokenBuckets(rate, max(1, burst), settings.ADMISSION_MAX_KEYS) if rate > 0 else None
+
+    def _reject(self, reason, status_code, detail, retry_after):
+        admission_rejections.inc(self.name, reason)
+        raise HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def check_rate(self, key):
+        if self.buckets is None:
+            return
+        wait = self.buckets.take(key)
+        if wait > 0:
+            self._reject("rate_limited", status.HTTP_429_TOO_MANY_REQUESTS, "Too many requests", wait)
+
+    async def acquire(self):
+        if self.slots is None:
+            return False
+        reason = await self.slots.acquire()
+        if reason is not None:
+            self._reject(reason, status.HTTP_503_SERVICE_UNAVAILABLE, "Server is busy, try again shortly", self.timeout)
+        return True
+
+    def release(self):
+        self.slots.release()
+
+    def stats(self):
+        return {
+            "active": self.slots.active if self.slots else None,
+            "waiting": self.slots.waiting if self.slots else None,
+            "tracked_keys": len(self.buckets) if self.buckets else None,
+        }
+
+policies = {name: AdmissionPolicy(name, **limits) for name, limits in settings.ADMISSION_LIMITS.items()}
+
+registry.gauge(
+    "admission_in_flight",
+    "Requests holding or waiting for an admission slot.",
+    lambda: {
+        (name, state): policy.stats()[state]
+        for name, policy in policies.items()
+        for state in ("active", "waiting")
+    },
+    ("route", "state"),
+)
+
+def parse_networks(spec):
+    """
+    Parse a comma-separated list of addresses or CIDRs.
+    """
+    try:
+        return [ipaddress.ip_network(entry.strip(), strict=False) for entry in spec.split(",") if entry.strip()]
+    except ValueError as e:
+        raise ValueError(f"TRUSTED_PROXIES is invalid: {e}") from None
+
+trusted_proxies = parse_networks(settings.TRUSTED_PROXIES)
+
+def is_trusted_proxy(host):
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in trusted_proxies)
+
+def client_ip(request: Request):
+    """
+    Address of the client behind a request. When the peer is one of
+    TRUSTED_PROXIES, X-Forwarded-For is walked from the right past trusted
+    hops; the first untrusted address is the client. Entries to its left
+    were supplied by the client and are ignored.
+    """
+    host = request.client.host if request.client else "unknown"
+    if not is_trusted_proxy(host):
+        return host
+    hops = [
+        hop.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for hop in header.split(",")
+        if hop.strip()
+    ]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+        host = hop
+    return host
+
+def admit(name, key=client_ip):
+    """
+    Build a dependency enforcing the ``name`` policy: a per-key token bucket
+    (429) followed by the route group's concurrency slots (503). Both
+    responses carry Retry-After. State is per worker process.
+
+    Args:
+        name (str): Key of settings.ADMISSION_LIMITS.
+        key: Dependency returning the rate-limit key. Only key on something
+            the client cannot choose freely: the client IP (the default) or
+            an authenticated principal, never an unauthenticated field,
+            which could be rotated to dodge the limit or set to someone
+            else's value to throttle them.
+    """
+    policy = policies[name]
+
+    async def dependency(request_key: str = Depends(key)):
+        if not settings.ADMISSION_ENABLED:
+            yield
+            return
+        policy.check_rate(request_key)
+        held = await policy.acquire()
+        try:
+            yield
+        finally:
+            if held:
+                policy.release()
+
+    return dependency
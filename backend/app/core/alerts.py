@@ -0,0 +1,262 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+import numpy as np
+from .aqi import AQI_CATEGORIES, AQI_POLLUTANTS, category_index, sub_indices
+from .config import settings
+from ..db.database import get_db_connection
+
+class AlertEngine:
+    """
+    Evaluates ingested readings against the thresholds of the users who
+    follow each reading's device.
+
+    Every (user, device) pair is a subscription. Subscriptions are kept in
+    arrays sorted by device and then by AQI threshold, so the users affected
+    by one reading are a prefix of its device's slice, found with one
+    searchsorted. Deduplication and rate limiting are a vectorized mask over
+    those prefixes, tracked per (user, device). The cost of a batch depends
+    on the number of readings and affected subscriptions, not on the number
+    of registered users.
+
+    Args:
+        thresholds (dict): AQI at or above which users of each severity are
+            alerted, e.g. {"mild": 200, "moderate": 150, "severe": 100}.
+        cooldown_seconds (float): Minimum time between two alerts to the
+            same user about the same device unless the AQI category worsens.
+        history_size (int): Recent alerts kept per user.
+    """
+
+    def __init__(self, thresholds, cooldown_seconds, history_size=20):
+        self.thresholds = thresholds
+        self.default_threshold = max(thresholds.values())
+        self.cooldown_seconds = cooldown_seconds
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        # user_id -> AQI threshold and user_id -> followed device ids; the
+        # subscription arrays below are rebuilt from them lazily
+        self._user_thresholds = {}
+        self._user_devices = {}
+        self._dirty = True
+        self._device_slices = {}
+        self._sub_users = np.empty(0, dtype=object)
+        self._sub_devices = np.empty(0, dtype=object)
+        self._sub_thresholds = np.empty(0, dtype=np.float64)
+        self._last_alert_at = np.empty(0, dtype=np.float64)
+        self._last_level = np.empty(0, dtype=np.int16)
+        self._recent = {}
+        self._listeners = []
+        self._reload_task = None
+
+    def __len__(self):
+        # Number of (user, device) subscriptions
+        return sum(len(device_ids) for device_ids in self._user_devices.values())
+
+    def subscribe(self, listener):
+        """
+        Register a callable invoked with the list of emitted alert events.
+        """
+        self._listeners.append(listener)
+
+    def threshold_for(self, severity):
+        return float(self.thresholds.get((severity or "").lower(), self.default_threshold))
+
+    def set_user(self, user_id, severity):
+        with self._lock:
+            self._user_thresholds[str(user_id)] = self.threshold_for(severity)
+            self._dirty = True
+
+    def set_devices(self, user_id, device_ids):
+        """
+        Replace the devices a user is alerted about.
+        """
+        with self._lock:
+            device_ids = set(device_ids)
+            if device_ids:
+                self._user_devices[str(user_id)] = device_ids
+            else:
+                self._user_devices.pop(str(user_id), None)
+            self._dirty = True
+
+    def devices(self, user_id):
+        with self._lock:
+            return sorted(self._user_devices.get(str(user_id), ()))
+
+    def remove_user(self, user_id):
+        with self._lock:
+            self._user_thresholds.pop(str(user_id), None)
+            self._user_devices.pop(str(user_id), None)
+            self._dirty = True
+
+    async def load(self):
+        """
+        Load every active user's severity and followed devices.
+        """
+        async with get_db_connection() as conn:
+            severities = await conn.fetch("""
+                SELECT DISTINCT ON (a.user_id) a.user_id, a.severity
+                FROM asthma_data a
+                JOIN users u ON u.id = a.user_id
+                WHERE NOT COALESCE(u.disabled, FALSE)
+                ORDER BY a.user_id, a.created_at DESC
+            """)
+            followed = await conn.fetch("""
+                SELECT d.user_id, d.device_id
+                FROM alert_devices d
+                JOIN users u ON u.id = d.user_id
+                WHERE NOT COALESCE(u.disabled, FALSE)
+            """)
+        user_devices = {}
+        for row in followed:
+            user_devices.setdefault(str(row["user_id"]), set()).add(row["device_id"])
+        with self._lock:
+            self._user_thresholds = {
+                str(row["user_id"]): self.threshold_for(row["severity"]) for row in severities
+            }
+            self._user_devices = user_devices
+            self._dirty = True
+
+    async def _reload_loop(self, every):
+        while True:
+            await asyncio.sleep(every)
+            try:
+                await self.load()
+            except Exception as e:
+                print(f"Error reloading alert subscriptions: {e}")
+
+    async def start(self, reload_seconds):
+        # Periodic reloads pick up severities and devices set through other workers
+        await self.load()
+        if reload_seconds > 0 and self._reload_task is None:
+            self._reload_task = asyncio.create_task(self._reload_loop(reload_seconds))
+
+    async def stop(self):
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+            await asyncio.gather(self._reload_task, return_exceptions=True)
+            self._reload_task = None
+
+    def _rebuild(self):
+        # Carry rate-limit state over to the new ordering
+        previous = {
+            (user_id, device_id): (at, level)
+            for user_id, device_id, at, level in zip(
+                self._sub_users, self._sub_devices, self._last_alert_at, self._last_level
+            )
+        }
+        # Users following a device before submitting the form get the most
+        # lenient threshold
+        subscriptions = sorted(
+            (device_id, self._user_thresholds.get(user_id, self.default_threshold), user_id)
+            for user_id, device_ids in self._user_devices.items()
+            for device_id in device_ids
+        )
+        self._sub_devices = np.array([d for d, _, _ in subscriptions], dtype=object)
+        self._sub_thresholds = np.array([t for _, t, _ in subscriptions], dtype=np.float64)
+        self._sub_users = np.array([u for _, _, u in subscriptions], dtype=object)
+        state = [previous.get((u, d), (-np.inf, -1)) for d, _, u in subscriptions]
+        self._last_alert_at = np.array([at for at, _ in state], dtype=np.float64)
+        self._last_level = np.array([level for _, level in state], dtype=np.int16)
+        self._device_slices = {}
+        for index, device_id in enumerate(self._sub_devices):
+            start, _ = self._device_slices.get(device_id, (index, index))
+            self._device_slices[device_id] = (start, index + 1)
+        self._dirty = False
+
+    def evaluate(self, readings, now=None):
+        """
+        Evaluate a batch of readings and alert the users following each
+        reading's device. Every device of the batch is judged on its own
+        worst reading.
+
+        Args:
+            readings (list): Reading dicts with device_id, timestamp and
+                pollutant values.
+
+        Returns:
+            list: The alert events emitted.
+        """
+        if not readings:
+            return []
+        now = now if now is not None else time.time()
+
+        concentrations = np.array(
+            [[np.nan if r.get(p) is None else r[p] for p in AQI_POLLUTANTS] for r in readings],
+            dtype=np.float64,
+        )
+        indices = sub_indices(concentrations)
+        indices[np.isnan(indices)] = -np.inf
+        # Worst pollutant decides each reading's AQI
+        aqi = indices.max(axis=1)
+        levels = category_index(aqi).astype(np.int16)
+
+        # Worst reading of each device in the batch
+        worst = {}
+        for row, reading in enumerate(readings):
+            device_id = reading.get("device_id")
+            if np.isfinite(aqi[row]) and (device_id not in worst or aqi[row] > aqi[worst[device_id]]):
+                worst[device_id] = row
+
+        with self._lock:
+            if self._dirty:
+                self._rebuild()
+            subs, rows = [], []
+            for device_id, row in worst.items():
+                bounds = self._device_slices.get(device_id)
+                if bounds is None:
+                    continue
+                # Followers whose threshold is <= the AQI form a prefix of the slice
+                start, stop = bounds
+                end = start + int(np.searchsorted(self._sub_thresholds[start:stop], aqi[row], side="right"))
+                if end > start:
+                    subs.append(np.arange(start, end))
+                    rows.append(np.full(end - start, row))
+            if not subs:
+                return []
+            subs, rows = np.concatenate(subs), np.concatenate(rows)
+            due = (
+                (levels[rows] > self._last_level[subs])
+                | (now - self._last_alert_at[subs] >= self.cooldown_seconds)
+            )
+            subs, rows = subs[due], rows[due]
+            self._last_alert_at[subs] = now
+            self._last_level[subs] = levels[rows]
+            user_ids = self._sub_users[subs]
+            thresholds = self._sub_thresholds[subs]
+
+        created_at = datetime.fromtimestamp(now, timezone.utc)
+        events = []
+        for user_id, threshold, row in zip(user_ids, thresholds, rows):
+            reading = readings[row]
+            events.append({
+                "aqi": round(float(aqi[row])),
+                "category": AQI_CATEGORIES[levels[row]][0],
+                "dominant_pollutant": AQI_POLLUTANTS[int(np.argmax(indices[row]))],
+                "device_id": reading.get("device_id"),
+                "reading_timestamp": reading.get("timestamp"),
+                "created_at": created_at,
+                "user_id": user_id,
+                "threshold": float(threshold),
+            })
+        with self._lock:
+            for event in events:
+                history = self._recent.get(event["user_id"])
+                if history is None:
+                    history = self._recent[event["user_id"]] = deque(maxlen=self.history_size)
+                history.appendleft(event)
+
+        if events:
+            for listener in self._listeners:
+                try:
+                    listener(events)
+                except Exception as e:
+                    print(f"Error in alert listener: {e}")
+        return events
+
+    def recent(self, user_id):
+        with self._lock:
+            return list(self._recent.get(str(user_id), ()))
+
+alert_engine = AlertEngine(settings.ALERT_AQI_THRESHOLDS, settings.ALERT_COOLDOWN_SECONDS)
@@ -0,0 +1,47 @@
+import numpy as np
+
+# Indian National AQI (CPCB) categories: upper AQI bound of each band
+AQI_CATEGORIES = (
+    ("good", 50),
+    ("satisfactory", 100),
+    ("moderate", 200),
+    ("poor", 300),
+    ("very_poor", 400),
+    ("severe", 500),
+)
+
+# Concentration breakpoints (µg/m³) mapped linearly onto AQI_BREAKPOINTS.
+# The last knot caps the open-ended "severe" band.
+AQI_BREAKPOINTS = np.array([0, 50, 100, 200, 300, 400, 500], dtype=np.float64)
+CONCENTRATION_BREAKPOINTS = {
+    "pm2_5": np.array([0, 30, 60, 90, 120, 250, 380], dtype=np.float64),
+    "pm10": np.array([0, 50, 100, 250, 350, 430, 510], dtype=np.float64),
+    "no2": np.array([0, 40, 80, 180, 280, 400, 520], dtype=np.float64),
+}
+AQI_POLLUTANTS = tuple(CONCENTRATION_BREAKPOINTS)
+
+_CATEGORY_EDGES = np.array([upper for _, upper in AQI_CATEGORIES[:-1]], dtype=np.float64)
+
+def sub_indices(concentrations):
+    """
+    Compute per-pollutant AQI sub-indices for many readings at once.
+
+    Args:
+        concentrations (np.ndarray): Shape (readings, len(AQI_POLLUTANTS));
+            NaN marks a missing value.
+
+    Returns:
+        np.ndarray: Sub-indices with the same shape; NaN stays NaN.
+    """
+    result = np.empty_like(concentrations, dtype=np.float64)
+    for j, pollutant in enumerate(AQI_POLLUTANTS):
+        column = concentrations[:, j]
+        result[:, j] = np.interp(column, CONCENTRATION_BREAKPOINTS[pollutant], AQI_BREAKPOINTS)
+        result[np.isnan(column), j] = np.nan
+    return result
+
+def category_index(aqi):
+    """
+    Map AQI values to indices into AQI_CATEGORIES.
+    """
+    return np.searchsorted(_CATEGORY_EDGES, aqi, side="left")
@@ -0,0 +1,122 @@
+import asyncio
+import json
+from datetime import date, datetime
+from .config import settings
+from .geo import geohash_encode
+from .latest import latest_readings
+from .alerts import alert_engine
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+def encode_message(message_type, data):
+    return json.dumps({"type": message_type, "data": data}, default=_json_default)
+
+class Subscription:
+    """
+    One connected client: its topics and a bounded outbox.
+
+    When the client reads slower than messages arrive, the oldest queued
+    message is dropped, so a slow consumer never holds memory or blocks
+    publishers.
+
+    Args:
+        maxsize (int): Messages buffered before the oldest is dropped.
+    """
+
+    def __init__(self, maxsize):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.topics = set()
+        self.dropped = 0
+
+    def offer(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def next_message(self):
+        return await self.queue.get()
+
+class Broker:
+    """
+    In-process topic fan-out. Messages are serialized once per publish and
+    the same string is queued for every subscriber of the topic.
+    """
+
+    def __init__(self, outbox_size, max_topics):
+        self.outbox_size = outbox_size
+        self.max_topics = max_topics
+        self._topics = {}
+        self._subscriptions = set()
+
+    def connect(self):
+        subscription = Subscription(self.outbox_size)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def disconnect(self, subscription):
+        for topic in list(subscription.topics):
+            self.unsubscribe(subscription, topic)
+        self._subscriptions.discard(subscription)
+
+    def subscribe(self, subscription, topic):
+        if topic in subscription.topics:
+            return True
+        if len(subscription.topics) >= self.max_topics:
+            return False
+        subscription.topics.add(topic)
+        self._topics.setdefault(topic, set()).add(subscription)
+        return True
+
+    def unsubscribe(self, subscription, topic):
+        subscription.topics.discard(topic)
+        subscribers = self._topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._topics[topic]
+
+    def publish(self, topic, message):
+        subscribers = self._topics.get(topic)
+        if not subscribers:
+            return 0
+        for subscription in subscribers:
+            subscription.offer(message)
+        return len(subscribers)
+
+    def stats(self):
+        return {
+            "connections": len(self._subscriptions),
+            "topics": len(self._topics),
+            "dropped": sum(s.dropped for s in self._subscriptions),
+        }
+
+broker = Broker(settings.LIVE_OUTBOX_SIZE, settings.LIVE_MAX_TOPICS)
+
+def reading_topics(reading):
+    """
+    Topics a reading is published on: its device and, for located readings,
+    the enclosing geohash areas at each LIVE_AREA_PRECISIONS length.
+    """
+    topics = [f"device:{reading['device_id']}"]
+    latitude, longitude = reading.get("latitude"), reading.get("longitude")
+    if latitude is not None and longitude is not None:
+        geohash = geohash_encode(latitude, longitude, max(settings.LIVE_AREA_PRECISIONS))
+        topics.extend(f"area:{geohash[:p]}" for p in settings.LIVE_AREA_PRECISIONS)
+    return topics
+
+def publish_readings(readings):
+    for reading in readings:
+        message = encode_message("reading", reading)
+        for topic in reading_topics(reading):
+            broker.publish(topic, message)
+
+def publish_alerts(events):
+    for event in events:
+        broker.publish(f"user:{event['user_id']}", encode_message("alert", event))
+
+latest_readings.subscribe(publish_readings)
+alert_engine.subscribe(publish_alerts)
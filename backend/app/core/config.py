@@ -1,9 +1,38 @@
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
+import json
 import os
+from typing import Optional
 
 load_dotenv()
 
+def json_object_env(name, default="{}"):
+    """
+    Read an environment variable holding a JSON object, failing at startup
+    with the variable's name when it is malformed.
+    """
+    raw = os.getenv(name, default)
+    try:
+        value = json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"{name} is not valid JSON ({e}): {raw!r}") from None
+    if not isinstance(value, dict):
+        raise ValueError(f"{name} must be a JSON object, got {raw!r}")
+    return value
+
+ADMISSION_DEFAULTS = {
+    "login": {"concurrency": 8, "queue": 32, "timeout": 5, "rate": 0, "burst": 10},
+    "signup": {"concurrency": 4, "queue": 16, "timeout": 5, "rate": 0, "burst": 5},
+    "recommendations": {"concurrency": 8, "queue": 16, "timeout": 10, "rate": 0, "burst": 5},
+    # Keyed on the authenticated user, so safe behind a proxy
+    "asthma_form": {"concurrency": 4, "queue": 8, "timeout": 10, "rate": 0.1, "burst": 5},
+}
+
+admission_overrides = json_object_env("ADMISSION_OVERRIDES")
+unknown_groups = set(admission_overrides) - set(ADMISSION_DEFAULTS)
+if unknown_groups:
+    raise ValueError(f"ADMISSION_OVERRIDES names unknown route groups: {sorted(unknown_groups)}")
+
 class Settings(BaseSettings):
     # Database settings
     DB_NAME: str = os.getenv("DB_NAME")
@@ -12,11 +41,161 @@ class Settings(BaseSettings):
     DB_HOST: str = os.getenv("DB_HOST")
     DB_PORT: str = os.getenv("DB_PORT")
 
+    # Connection pool settings
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+    # Pooled connections idle longer than this are pinged before reuse
+    DB_HEALTHCHECK_IDLE_SECONDS: float = float(os.getenv("DB_HEALTHCHECK_IDLE_SECONDS", "30"))
+
     # JWT settings
     JWT_SECRET: str = os.getenv("JWT_SECRET")
     ALGORITHM: str = os.getenv("ALGORITHM")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 
+    # Password hashing settings
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+
+    # Authenticated-principal cache settings
+    USER_CACHE_MAX_SIZE: int = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+    USER_CACHE_TTL_SECONDS: float = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+    # Gemini API key used by the recommendation agent and report embedder
+    GOOGLE_API_KEY: Optional[str] = os.getenv("GOOGLE_API_KEY")
+    # Import the AI stack in the background at startup instead of on first use
+    AI_WARMUP_ON_STARTUP: bool = os.getenv("AI_WARMUP_ON_STARTUP", "false").lower() == "true"
+
+    # Recommendation cache settings
+    RECOMMENDATION_CACHE_ENABLED: bool = os.getenv("RECOMMENDATION_CACHE_ENABLED", "true").lower() == "true"
+    RECOMMENDATION_CACHE_MAX_SIZE: int = int(os.getenv("RECOMMENDATION_CACHE_MAX_SIZE", "5000"))
+    RECOMMENDATION_CACHE_TTL_SECONDS: float = float(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", "900"))
+    # Upper edges of the pollutant bands (µg/m³) that share a cached
+    # recommendation; defaults follow the Indian AQI categories
+    RECOMMENDATION_BANDS: dict = {
+        "pm1_0": [30, 60, 90, 120, 250],
+        "pm2_5": [30, 60, 90, 120, 250],
+        "pm10": [50, 100, 250, 350, 430],
+        "no2": [40, 80, 180, 280, 400],
+    }
+
+    # Recommendation job settings
+    RECOMMENDATION_WORKERS: int = int(os.getenv("RECOMMENDATION_WORKERS", "4"))
+    RECOMMENDATION_MODEL_CONCURRENCY: int = int(os.getenv("RECOMMENDATION_MODEL_CONCURRENCY", "2"))
+    RECOMMENDATION_QUEUE_MAX_SIZE: int = int(os.getenv("RECOMMENDATION_QUEUE_MAX_SIZE", "100"))
+    RECOMMENDATION_JOB_TTL_SECONDS: float = float(os.getenv("RECOMMENDATION_JOB_TTL_SECONDS", "600"))
+    # "gemini" for the real agent, "stub" for an offline stand-in
+    RECOMMENDATION_AGENT: str = os.getenv("RECOMMENDATION_AGENT", "gemini")
+    STUB_AGENT_LATENCY_SECONDS: float = float(os.getenv("STUB_AGENT_LATENCY_SECONDS", "0.5"))
+
+    # Bulk recommendation precompute settings
+    PRECOMPUTE_PAGE_SIZE: int = int(os.getenv("PRECOMPUTE_PAGE_SIZE", "200"))
+    # Users generated at once; model calls also count against RECOMMENDATION_MODEL_CONCURRENCY
+    PRECOMPUTE_CONCURRENCY: int = int(os.getenv("PRECOMPUTE_CONCURRENCY", "1"))
+    PRECOMPUTE_MAX_ATTEMPTS: int = int(os.getenv("PRECOMPUTE_MAX_ATTEMPTS", "3"))
+    PRECOMPUTE_BACKOFF_SECONDS: float = float(os.getenv("PRECOMPUTE_BACKOFF_SECONDS", "2"))
+    # Key admin endpoints expect in X-Admin-Key; they are disabled when unset
+    ADMIN_API_KEY: Optional[str] = os.getenv("ADMIN_API_KEY")
+
+    # Sensor ingestion settings
+    # Expected reporting interval of a device, in seconds
+    SENSOR_INTERVAL_SECONDS: float = float(os.getenv("SENSOR_INTERVAL_SECONDS", "15"))
+    # Missed intervals after which a device's latest reading is flagged stale
+    SENSOR_STALE_AFTER_INTERVALS: int = int(os.getenv("SENSOR_STALE_AFTER_INTERVALS", "4"))
+    # How often each worker resyncs its latest-reading index from the database
+    LATEST_READINGS_REFRESH_SECONDS: float = float(os.getenv("LATEST_READINGS_REFRESH_SECONDS", "30"))
+    SENSOR_BATCH_MAX_SIZE: int = int(os.getenv("SENSOR_BATCH_MAX_SIZE", "5000"))
+    # Shared key devices send in X-API-Key; ingestion is disabled when unset
+    SENSOR_INGEST_API_KEY: Optional[str] = os.getenv("SENSOR_INGEST_API_KEY")
+    # Device clock drift tolerated ahead of server time, in seconds
+    SENSOR_MAX_CLOCK_SKEW_SECONDS: float = float(os.getenv("SENSOR_MAX_CLOCK_SKEW_SECONDS", "300"))
+    # Oldest reading accepted, e.g. a device uploading its backlog after an outage
+    SENSOR_MAX_READING_AGE_DAYS: float = float(os.getenv("SENSOR_MAX_READING_AGE_DAYS", "30"))
+    # Idempotency-Key values are remembered this long; a batch retried later is stored again
+    SENSOR_IDEMPOTENCY_RETENTION_HOURS: float = float(os.getenv("SENSOR_IDEMPOTENCY_RETENTION_HOURS", "48"))
+    # How often each worker deletes expired idempotency keys (0 disables)
+    SENSOR_IDEMPOTENCY_SWEEP_SECONDS: float = float(os.getenv("SENSOR_IDEMPOTENCY_SWEEP_SECONDS", "3600"))
+
+    # Forecasting settings
+    FORECAST_MODEL_PATH: str = os.getenv("FORECAST_MODEL_PATH", "models/forecast_model.joblib")
+    # Past readings per pollutant in the model's lag features
+    FORECAST_LAGS: int = int(os.getenv("FORECAST_LAGS", "6"))
+    FORECAST_MAX_STEPS: int = int(os.getenv("FORECAST_MAX_STEPS", "48"))
+    FORECAST_MAX_DEVICES: int = int(os.getenv("FORECAST_MAX_DEVICES", "500"))
+
+    # Alert settings: users are alerted about the devices they follow, at or
+    # above the AQI set for their asthma severity
+    ALERT_AQI_THRESHOLDS: dict = {"mild": 200, "moderate": 150, "severe": 100}
+    # Minimum seconds between alerts to a user about one device unless the AQI category worsens
+    ALERT_COOLDOWN_SECONDS: float = float(os.getenv("ALERT_COOLDOWN_SECONDS", "1800"))
+    ALERT_MAX_DEVICES_PER_USER: int = int(os.getenv("ALERT_MAX_DEVICES_PER_USER", "20"))
+    # How often each worker reloads severities and followed devices from the database
+    ALERT_RELOAD_SECONDS: float = float(os.getenv("ALERT_RELOAD_SECONDS", "60"))
+
+    # Live push settings
+    # Messages buffered per connection before the oldest is dropped
+    LIVE_OUTBOX_SIZE: int = int(os.getenv("LIVE_OUTBOX_SIZE", "100"))
+    LIVE_MAX_TOPICS: int = int(os.getenv("LIVE_MAX_TOPICS", "50"))
+    # Geohash lengths readings are published under as area:<geohash> topics
+    LIVE_AREA_PRECISIONS: tuple = (4, 5, 6)
+    # Seconds between keep-alive comments on idle SSE streams
+    LIVE_HEARTBEAT_SECONDS: float = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+
+    # External AQI feed (WAQI) proxy settings
+    WAQI_BASE_URL: str = os.getenv("WAQI_BASE_URL", "https://api.waqi.info")
+    WAQI_TOKEN: Optional[str] = os.getenv("WAQI_TOKEN")
+    # Responses are served fresh for the TTL, then served stale while refreshing
+    WAQI_CACHE_TTL_SECONDS: float = float(os.getenv("WAQI_CACHE_TTL_SECONDS", "300"))
+    WAQI_STALE_TTL_SECONDS: float = float(os.getenv("WAQI_STALE_TTL_SECONDS", "3600"))
+    WAQI_CACHE_MAX_SIZE: int = int(os.getenv("WAQI_CACHE_MAX_SIZE", "5000"))
+    WAQI_TIMEOUT_SECONDS: float = float(os.getenv("WAQI_TIMEOUT_SECONDS", "10"))
+    WAQI_MAX_CONNECTIONS: int = int(os.getenv("WAQI_MAX_CONNECTIONS", "20"))
+    # Geohash length points (~4.9 km at 5) and bounding boxes (~156 km at 3) are snapped to
+    WAQI_GEO_PRECISION: int = int(os.getenv("WAQI_GEO_PRECISION", "5"))
+    WAQI_BOUNDS_PRECISION: int = int(os.getenv("WAQI_BOUNDS_PRECISION", "3"))
+
+    # Station spatial index settings
+    # Grid cell edge in degrees (~5.5 km at 0.05)
+    SPATIAL_CELL_DEGREES: float = float(os.getenv("SPATIAL_CELL_DEGREES", "0.05"))
+    STATION_NEAREST_MAX_K: int = int(os.getenv("STATION_NEAREST_MAX_K", "50"))
+    # Bounding-box results above this many stations are returned as clusters
+    STATION_MAX_POINTS: int = int(os.getenv("STATION_MAX_POINTS", "200"))
+    STATION_CLUSTER_GRID: int = int(os.getenv("STATION_CLUSTER_GRID", "8"))
+
+    # Report upload settings
+    # Must stay under static/ so stored reports are served at /static/...
+    REPORT_UPLOAD_DIR: str = os.getenv("REPORT_UPLOAD_DIR", "static/asthma-reports")
+    REPORT_MAX_BYTES: int = int(os.getenv("REPORT_MAX_BYTES", str(10 * 1024 * 1024)))
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+
+    # Report pre-ingestion: embed uploaded reports in the background
+    REPORT_PREINGEST_ENABLED: bool = os.getenv("REPORT_PREINGEST_ENABLED", "true").lower() == "true"
+    INGESTION_WORKERS: int = int(os.getenv("INGESTION_WORKERS", "2"))
+    INGESTION_QUEUE_MAX_SIZE: int = int(os.getenv("INGESTION_QUEUE_MAX_SIZE", "100"))
+
+    # Metrics; SLOW_REQUEST_SECONDS=0 turns the slow-request log off
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    SLOW_REQUEST_SECONDS: float = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+    SLOW_REQUEST_SAMPLE_RATE: float = float(os.getenv("SLOW_REQUEST_SAMPLE_RATE", "0.1"))
+
+    # Admission control, per route group. concurrency: requests served at
+    # once (0 = unlimited); queue/timeout: requests that may wait for a slot
+    # and for how long before a 503; rate/burst: token bucket per user or
+    # client IP before a 429 (rate 0 = unlimited). Override groups with
+    # ADMISSION_OVERRIDES='{"login": {"rate": 0.5, "burst": 10}}'.
+    # IP-keyed groups have no rate limit by default: behind a reverse proxy
+    # every client shares its address until TRUSTED_PROXIES is set.
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_MAX_KEYS: int = int(os.getenv("ADMISSION_MAX_KEYS", "100000"))
+    ADMISSION_LIMITS: dict = {
+        name: {**limits, **admission_overrides.get(name, {})}
+        for name, limits in ADMISSION_DEFAULTS.items()
+    }
+    # Comma-separated proxy addresses or CIDRs whose X-Forwarded-For is
+    # trusted for the client IP, e.g. "10.0.0.0/8,127.0.0.1"
+    TRUSTED_PROXIES: str = os.getenv("TRUSTED_PROXIES", "")
+
     # CORS settings
     CORS_ORIGINS: list = ["*"]
     CORS_CREDENTIALS: bool = True
@@ -0,0 +1,165 @@
+import os
+import threading
+from datetime import timedelta
+import numpy as np
+from .config import settings
+from .latest import latest_readings
+
+# Pollutants the model consumes and predicts, in column order
+FORECAST_POLLUTANTS = ("pm2_5", "pm10", "no2")
+
+HISTORY_SQL = """
+    SELECT d.device_id, s.timestamp, s.pm2_5, s.pm10, s.no2
+    FROM unnest($1::text[]) AS d(device_id)
+    CROSS JOIN LATERAL (
+        SELECT timestamp, pm2_5, pm10, no2
+        FROM sensor_data
+        WHERE sensor_data.device_id = d.device_id
+        ORDER BY timestamp DESC
+        LIMIT $2
+    ) s
+"""
+
+def lag_features(history):
+    """
+    Turn pollutant histories into the model's lag-feature matrix.
+
+    Args:
+        history (np.ndarray): Shape (devices, lags, pollutants), oldest first.
+
+    Returns:
+        np.ndarray: Shape (devices, lags * pollutants), ordered lag-major with
+        the most recent lag first: [pm2_5(t-1), pm10(t-1), no2(t-1), pm2_5(t-2), ...].
+    """
+    return history[:, ::-1, :].reshape(history.shape[0], -1)
+
+def recursive_forecast(model, history, steps):
+    """
+    Run a recursive multi-step forecast for many devices at once. Each step
+    is a single batched predict over all devices; predictions are fed back
+    as the newest lag for the next step.
+
+    Args:
+        model: Fitted multi-output regressor with a scikit-learn predict().
+        history (np.ndarray): Shape (devices, lags, pollutants), oldest first.
+        steps (int): Number of steps ahead to predict.
+
+    Returns:
+        np.ndarray: Shape (devices, steps, pollutants).
+    """
+    window = history.astype(np.float64, copy=True)
+    predictions = np.empty((window.shape[0], steps, window.shape[2]))
+    for step in range(steps):
+        predicted = np.asarray(model.predict(lag_features(window)), dtype=np.float64)
+        predicted = predicted.reshape(window.shape[0], window.shape[2])
+        # Concentrations cannot go negative
+        np.maximum(predicted, 0.0, out=predicted)
+        predictions[:, step, :] = predicted
+        window = np.concatenate([window[:, 1:, :], predicted[:, None, :]], axis=1)
+    return predictions
+
+class Forecaster:
+    """
+    Holds the serialized forecasting model, loaded once at startup, and a
+    per-device cache of forecasts that lives until the device's next reading.
+
+    Args:
+        model_path (str): Path to the joblib-serialized MultiOutputRegressor.
+        lags (int): Number of past readings per pollutant the model expects.
+    """
+
+    def __init__(self, model_path, lags):
+        self.model_path = model_path
+        self.lags = lags
+        self.model = None
+        # device_id -> (timestamp of newest reading used, forecast points)
+        self._cache = {}
+        self._lock = threading.Lock()
+        latest_readings.subscribe(self._on_readings)
+
+    @property
+    def ready(self):
+        return self.model is not None
+
+    def load(self):
+        if not os.path.exists(self.model_path):
+            print(f"Forecast model not found at {self.model_path}; forecasting disabled")
+            return False
+        try:
+            import joblib
+            self.model = joblib.load(self.model_path)
+            return True
+        except Exception as e:
+            print(f"Error loading forecast model: {e}")
+            return False
+
+    def _on_readings(self, readings):
+        # A new reading makes the device's cached forecast obsolete
+        with self._lock:
+            for reading in readings:
+                self._cache.pop(reading["device_id"], None)
+
+    def cached(self, device_id, steps):
+        with self._lock:
+            entry = self._cache.get(device_id)
+        if entry is None or len(entry[1]) < steps:
+            return None
+        return entry[1][:steps]
+
+    async def fetch_history(self, conn, device_ids):
+        """
+        Load the last ``lags`` readings of each device into one array.
+
+        Returns:
+            tuple: (device_ids with enough history, history array of shape
+            (devices, lags, pollutants), newest timestamp per device).
+        """
+        rows = await conn.fetch(HISTORY_SQL, list(device_ids), self.lags)
+        by_device = {}
+        for row in rows:
+            by_device.setdefault(row["device_id"], []).append(row)
+
+        ready_ids = [d for d in device_ids if len(by_device.get(d, ())) == self.lags]
+        history = np.full((len(ready_ids), self.lags, len(FORECAST_POLLUTANTS)), np.nan)
+        last_seen = []
+        for i, device_id in enumerate(ready_ids):
+            device_rows = by_device[device_id]
+            # Rows arrive newest first; the array is oldest first
+            history[i] = [
+                [np.nan if row[p] is None else row[p] for p in FORECAST_POLLUTANTS]
+                for row in reversed(device_rows)
+            ]
+            last_seen.append(device_rows[0]["timestamp"])
+        return ready_ids, history, last_seen
+
+    def predict(self, device_ids, history, last_seen, steps):
+        """
+        Forecast all devices in one batch and cache the results.
+
+        Returns:
+            dict: device_id -> list of forecast points.
+        """
+        predictions = recursive_forecast(self.model, history, steps)
+        interval = timedelta(seconds=settings.SENSOR_INTERVAL_SECONDS)
+        results = {}
+        for i, device_id in enumerate(device_ids):
+            points = [
+                {
+                    "step": step + 1,
+                    "timestamp": last_seen[i] + interval * (step + 1),
+                    **{
+                        p: float(predictions[i, step, j])
+                        for j, p in enumerate(FORECAST_POLLUTANTS)
+                    },
+                }
+                for step in range(steps)
+            ]
+            results[device_id] = points
+            with self._lock:
+                current = latest_readings.get(device_id)
+                # Skip caching if a newer reading arrived while predicting
+                if current is None or current["timestamp"] <= last_seen[i]:
+                    self._cache[device_id] = (last_seen[i], points)
+        return results
+
+forecaster = Forecaster(settings.FORECAST_MODEL_PATH, settings.FORECAST_LAGS)
@@ -0,0 +1,61 @@
+import asyncio
+import os
+from fastapi import HTTPException
+from .config import settings
+from .jobs import JobQueue
+from .knowledge import KnowledgeIndex
+
+# LanceDB lives in the backend folder; it is created on first ingestion
+lancedb_dir = os.path.join(os.getcwd(), "lancedb_data")
+
+def gemini_embedder():
+    from agno.embedder.google import GeminiEmbedder
+    return GeminiEmbedder(api_key=settings.GOOGLE_API_KEY)
+
+# Content-hashed index of embedded reports, one LanceDB table per PDF
+knowledge_index = KnowledgeIndex(uri=lancedb_dir, embedder_factory=gemini_embedder)
+
+def warm_up():
+    """
+    Import the agno/Gemini/LanceDB stack and build the embedder ahead of the
+    first recommendation or ingestion. Blocking; run it in a thread.
+    """
+    try:
+        import agno.agent  # noqa: F401
+        import agno.knowledge.pdf  # noqa: F401
+        import agno.models.google  # noqa: F401
+        import agno.vectordb.lancedb  # noqa: F401
+        return knowledge_index.embedder
+    except Exception as e:
+        print(f"Error warming up the AI stack: {e}")
+
+async def ingest_report(pdf_path, owner_id=None):
+    """
+    Job handler: extract, chunk and embed an uploaded report.
+    """
+    await asyncio.to_thread(knowledge_index.ingest, pdf_path, owner_id)
+    return {"pdf_path": pdf_path}
+
+# Reports are embedded off the request path as soon as they are uploaded
+report_ingestion = JobQueue(
+    handler=ingest_report,
+    workers=settings.INGESTION_WORKERS,
+    max_queue_size=settings.INGESTION_QUEUE_MAX_SIZE,
+    result_ttl=settings.RECOMMENDATION_JOB_TTL_SECONDS,
+)
+
+async def enqueue_report(pdf_path, digest, owner_id=None):
+    """
+    Queue a report for ingestion unless it is already indexed. A full queue
+    is not an error: the report is then ingested on first use instead.
+    """
+    if not settings.REPORT_PREINGEST_ENABLED:
+        return
+    # May re-read the manifest file, so keep it off the event loop
+    if await asyncio.to_thread(knowledge_index.is_indexed, digest):
+        return
+    try:
+        report_ingestion.submit(digest, pdf_path=pdf_path, owner_id=owner_id)
+        knowledge_index.mark_queued(digest)
+    except HTTPException as e:
+        print(f"Report {digest} not queued for ingestion: {e.detail}")
@@ -0,0 +1,171 @@
+import asyncio
+import time
+import uuid
+from fastapi import HTTPException, status
+from .cache import TTLCache
+
+class Job:
+    """
+    A unit of background work and its outcome.
+
+    Attributes:
+        id (str): Public job identifier.
+        key (str): Coalescing key; concurrent submissions with the same key
+            share one job.
+        status (str): One of queued, running, succeeded or failed.
+        result: The handler's return value once succeeded.
+        error (Exception): The handler's exception once failed.
+    """
+
+    def __init__(self, key, kwargs):
+        self.id = str(uuid.uuid4())
+        self.key = key
+        self.kwargs = kwargs
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = asyncio.Event()
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == "succeeded":
+            data["result"] = self.result
+        elif self.status == "failed":
+            data["error"] = getattr(self.error, "detail", None) or str(self.error)
+            data["status_code"] = getattr(self.error, "status_code", 500)
+        return data
+
+class JobQueue:
+    """
+    In-process job queue drained by a fixed pool of asyncio workers.
+
+    Args:
+        handler: Coroutine function called with each job's kwargs.
+        workers (int): Number of jobs processed concurrently.
+        max_queue_size (int): Pending jobs accepted before submissions are
+            rejected with 503.
+        result_ttl (float): Seconds finished jobs stay retrievable.
+        max_results (int): Maximum number of finished jobs retained.
+    """
+
+    def __init__(self, handler, workers, max_queue_size, result_ttl, max_results=10000):
+        self.handler = handler
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self._queue = None
+        self._tasks = []
+        self._jobs = TTLCache(max_results, result_ttl)
+        self._in_flight = {}
+
+    @property
+    def running(self):
+        return bool(self._tasks)
+
+    def depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._tasks = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, key, **kwargs):
+        """
+        Enqueue a job, or return the in-flight job with the same key.
+
+        Returns:
+            Job: The queued or coalesced job.
+        """
+        job = self._in_flight.get(key)
+        if job is not None:
+            return job
+
+        if self._queue is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Job queue is not running"
+            )
+
+        job = Job(key, kwargs)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many pending jobs, try again later",
+                headers={"Retry-After": "5"},
+            )
+        self._in_flight[key] = job
+        self._jobs.set(job.id, job)
+        return job
+
+    def completed(self, key, result):
+        """
+        Record a job that finished without queueing, e.g. a cache hit, so
+        clients can poll it like any other job.
+        """
+        job = Job(key, {})
+        job.status = "succeeded"
+        job.result = result
+        job.started_at = job.finished_at = job.created_at
+        job.done.set()
+        self._jobs.set(job.id, job)
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    async def wait(self, job):
+        """
+        Wait for a job to finish and return its result, re-raising its error.
+        """
+        await job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await self.handler(**job.kwargs)
+                job.status = "succeeded"
+            except asyncio.CancelledError:
+                job.error = HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Job cancelled during shutdown"
+                )
+                job.status = "failed"
+                raise
+            except Exception as e:
+                print(f"Error in job {job.id}: {e}")
+                job.error = e
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                if self._in_flight.get(job.key) is job:
+                    del self._in_flight[job.key]
+                # Keep finished jobs retrievable for their TTL from completion
+                self._jobs.set(job.id, job)
+                job.done.set()
+                self._queue.task_done()
@@ -0,0 +1,301 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from .metrics import span
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks on Windows; run a single worker there
+    fcntl = None
+
+@contextmanager
+def file_lock(path):
+    """
+    Hold an exclusive advisory lock on ``path`` across processes.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """
+    Compute the SHA-256 digest of a file without loading it into memory.
+
+    Args:
+        path (str): Path to the file.
+        chunk_size (int): Number of bytes read per iteration.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def remove_public_chunks(root):
+    """
+    Delete the <name>.chunks.json files earlier versions wrote next to the
+    reports, where the public static mount served them.
+
+    Args:
+        root (str): Directory holding the uploaded reports.
+
+    Returns:
+        int: Number of files removed.
+    """
+    removed = 0
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(".chunks.json"):
+                os.remove(os.path.join(directory, name))
+                removed += 1
+    return removed
+
+class KnowledgeIndex:
+    """
+    Persistent index of embedded PDF reports keyed by content hash.
+
+    Every distinct PDF gets its own LanceDB table, so retrieval for a patient
+    only searches that patient's report and an unchanged file is never
+    re-chunked or re-embedded. A JSON manifest next to the tables records
+    which digests have been fully loaded. Workers share the manifest: writes
+    re-read and merge it under a file lock, and a digest is loaded by one
+    process at a time. Each worker keeps the manifest in memory and only
+    re-reads the file after another worker has replaced it. The extracted
+    text of each report is kept under ``uri``, never next to the PDF, which
+    is publicly served.
+
+    Args:
+        uri (str): Directory holding the LanceDB tables and the manifest.
+        embedder_factory: Callable returning the embedder used to vectorise
+            chunks; called on first ingestion so the AI stack is only
+            imported when a report is actually embedded.
+    """
+
+    MANIFEST_NAME = "manifest.json"
+    CHUNKS_DIR = "chunks"
+
+    def __init__(self, uri, embedder_factory):
+        self.uri = uri
+        self.embedder_factory = embedder_factory
+        self._embedder = None
+        self.manifest_path = os.path.join(uri, self.MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._digest_locks = {}
+        # (path, size, mtime) -> digest, so unchanged files are not rehashed
+        self._digest_cache = {}
+        # digest -> state of reports not in the manifest yet
+        self._status = {}
+        self._manifest_version = self._manifest_version_now()
+        self._manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Error reading knowledge manifest, starting empty: {e}")
+            return {}
+
+    @property
+    def embedder(self):
+        with self._lock:
+            if self._embedder is None:
+                self._embedder = self.embedder_factory()
+            return self._embedder
+
+    def _manifest_version_now(self):
+        # Every write replaces the file, so the inode changes even when the
+        # filesystem's mtime resolution is too coarse to tell writes apart
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _refresh_manifest(self):
+        # Pick up digests other workers have indexed, re-reading the file only
+        # when it was replaced; it is replaced atomically, so no lock is needed
+        version = self._manifest_version_now()
+        if version is None or version == self._manifest_version:
+            return
+        manifest = self._read_manifest()
+        with self._lock:
+            self._manifest.update(manifest)
+            self._manifest_version = version
+
+    def _record(self, digest, entry):
+        """
+        Add one digest to the manifest, merging entries other workers wrote
+        since this process last read it.
+        """
+        os.makedirs(self.uri, exist_ok=True)
+        with file_lock(f"{self.manifest_path}.lock"):
+            manifest = self._read_manifest()
+            manifest[digest] = entry
+            # Write to a temp file first so a crash never leaves a torn manifest
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+            version = self._manifest_version_now()
+        with self._lock:
+            self._manifest.update(manifest)
+            self._manifest_version = version
+
+    def digest_for(self, pdf_path):
+        stat = os.stat(pdf_path)
+        key = (pdf_path, stat.st_size, stat.st_mtime_ns)
+        digest = self._digest_cache.get(key)
+        if digest is None:
+            digest = file_sha256(pdf_path)
+            self._digest_cache[key] = digest
+        return digest
+
+    @staticmethod
+    def table_name_for(digest):
+        return f"report_{digest[:32]}"
+
+    def is_indexed(self, digest):
+        with self._lock:
+            if digest in self._manifest:
+                return True
+        self._refresh_manifest()
+        with self._lock:
+            return digest in self._manifest
+
+    def _lock_for(self, digest):
+        with self._lock:
+            return self._digest_locks.setdefault(digest, threading.Lock())
+
+    def status(self, digest):
+        """
+        Ingestion state of a report: queued, processing, ready or failed,
+        or None if it was never submitted.
+        """
+        self.is_indexed(digest)
+        with self._lock:
+            entry = self._manifest.get(digest)
+            if entry is not None:
+                return {"status": "ready", **entry}
+            return self._status.get(digest)
+
+    def mark_queued(self, digest):
+        with self._lock:
+            current = self._status.get(digest)
+            if digest not in self._manifest and not (current and current["status"] == "processing"):
+                self._status[digest] = {"status": "queued"}
+
+    def _knowledge_base(self, pdf_path, digest):
+        from agno.knowledge.pdf import PDFKnowledgeBase, PDFReader
+        from agno.vectordb.lancedb import LanceDb, SearchType
+
+        return PDFKnowledgeBase(
+            path=pdf_path,
+            vector_db=LanceDb(
+                uri=self.uri,
+                table_name=self.table_name_for(digest),
+                search_type=SearchType.hybrid,
+                embedder=self.embedder,
+            ),
+            reader=PDFReader(chunk=True),
+        )
+
+    def chunks_path_for(self, digest):
+        return os.path.join(self.uri, self.CHUNKS_DIR, f"{digest}.json")
+
+    def ingest(self, pdf_path, owner_id=None):
+        """
+        Extract, chunk and embed a report unless this exact content is
+        already indexed. The extracted chunks and their metadata are written
+        to <uri>/chunks/<digest>.json.
+
+        Args:
+            pdf_path (str): Path to the PDF report.
+            owner_id (str, optional): The user the report belongs to, kept in
+                the manifest for bookkeeping.
+
+        Returns:
+            PDFKnowledgeBase: A knowledge base backed by the report's own table.
+        """
+        digest = self.digest_for(pdf_path)
+        knowledge = self._knowledge_base(pdf_path, digest)
+
+        if self.is_indexed(digest) and knowledge.vector_db.exists():
+            return knowledge
+
+        # Serialise loads of the same document, within this process and across
+        # workers; different documents proceed in parallel
+        with self._lock_for(digest), file_lock(os.path.join(self.uri, "locks", f"{digest}.lock")):
+            if self.is_indexed(digest) and knowledge.vector_db.exists():
+                return knowledge
+            with self._lock:
+                self._status[digest] = {"status": "processing"}
+            try:
+                with span("pdf_parse"):
+                    documents = knowledge.reader.read(pdf_path)
+                chunks_path = self.chunks_path_for(digest)
+                os.makedirs(os.path.dirname(chunks_path), exist_ok=True)
+                tmp_path = f"{chunks_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(
+                        [
+                            {"id": d.id, "name": d.name, "meta_data": d.meta_data, "content": d.content}
+                            for d in documents
+                        ],
+                        f,
+                    )
+                os.replace(tmp_path, chunks_path)
+
+                # A table that is not in the manifest is a partial load left by a
+                # crash; no worker reads it, and no other worker is loading it while
+                # we hold the digest lock, so start it over to avoid duplicates
+                with span("embedding"):
+                    if knowledge.vector_db.exists():
+                        knowledge.vector_db.drop()
+                    knowledge.load_documents(documents, skip_existing=False)
+            except Exception as e:
+                with self._lock:
+                    self._status[digest] = {"status": "failed", "error": str(e)}
+                raise
+            self._record(digest, {
+                "table": self.table_name_for(digest),
+                "source": pdf_path,
+                "owner_id": owner_id,
+                "chunks": len(documents),
+                "chunks_path": chunks_path,
+                "indexed_at": datetime.now(timezone.utc).isoformat(),
+            })
+            with self._lock:
+                self._status.pop(digest, None)
+        return knowledge
+
+    def get_knowledge_base(self, pdf_path, owner_id=None):
+        """
+        Return a knowledge base scoped to one PDF. Reports are normally
+        ingested in the background at upload time; one that is not ready yet
+        is ingested here, or waited for if ingestion is already running.
+
+        Args:
+            pdf_path (str): Path to the PDF report.
+            owner_id (str, optional): The user the report belongs to.
+
+        Returns:
+            PDFKnowledgeBase: A knowledge base backed by the report's own table.
+        """
+        return self.ingest(pdf_path, owner_id=owner_id)
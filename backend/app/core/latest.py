@@ -0,0 +1,173 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from .config import settings
+from ..db.database import get_db_connection
+
+READING_FIELDS = ("device_id", "timestamp", "pm1_0", "pm2_5", "pm10", "no2", "latitude", "longitude")
+
+class LatestReadings:
+    """
+    In-process "latest reading per device" index.
+
+    Updated by the ingestion endpoint as batches are written and resynced
+    periodically from the sensor_latest table, so readers get the current
+    value for a device (or the freshest device overall) in O(1) without
+    touching sensor_data. Listeners registered with subscribe() are called
+    with the readings that changed.
+
+    Args:
+        interval_seconds (float): Expected reporting interval of a device.
+        stale_after_intervals (int): Missed intervals after which a device's
+            reading is flagged as stale.
+        max_clock_skew_seconds (float): How far ahead of server time a
+            reading may be dated; later readings are ignored.
+    """
+
+    def __init__(self, interval_seconds, stale_after_intervals, max_clock_skew_seconds=300):
+        self.interval_seconds = interval_seconds
+        self.stale_after_intervals = stale_after_intervals
+        self.max_clock_skew_seconds = max_clock_skew_seconds
+        self._by_device = {}
+        self._freshest = None
+        self._listeners = []
+        self._refresh_task = None
+
+    def __len__(self):
+        return len(self._by_device)
+
+    def subscribe(self, listener):
+        """
+        Register a callable invoked with the list of readings that changed.
+        """
+        self._listeners.append(listener)
+
+    def update(self, readings):
+        """
+        Merge readings, keeping only the newest per device. Readings dated
+        beyond the allowed clock skew are dropped, so a bad device clock
+        cannot pin a device (or the freshest reading) to the future.
+
+        Args:
+            readings (list): Dicts with the READING_FIELDS keys.
+
+        Returns:
+            list: The readings that replaced a device's previous value.
+        """
+        changed = {}
+        horizon = datetime.now(timezone.utc) + timedelta(seconds=self.max_clock_skew_seconds)
+        for reading in readings:
+            if reading["timestamp"] > horizon:
+                continue
+            device_id = reading["device_id"]
+            current = changed.get(device_id) or self._by_device.get(device_id)
+            if current is None or reading["timestamp"] > current["timestamp"]:
+                changed[device_id] = reading
+
+        for device_id, reading in changed.items():
+            self._by_device[device_id] = reading
+            if self._freshest is None or reading["timestamp"] >= self._freshest["timestamp"]:
+                self._freshest = reading
+
+        updated = list(changed.values())
+        if updated:
+            for listener in self._listeners:
+                try:
+                    listener(updated)
+                except Exception as e:
+                    print(f"Error in latest-reading listener: {e}")
+        return updated
+
+    def _with_staleness(self, reading, now=None):
+        now = now or datetime.now(timezone.utc)
+        age = (now - reading["timestamp"]).total_seconds()
+        return {
+            **reading,
+            "age_seconds": age,
+            # A reading from beyond the clock skew is not trustworthy, not fresh
+            "stale": age > self.interval_seconds * self.stale_after_intervals
+                or age < -self.max_clock_skew_seconds,
+        }
+
+    def get(self, device_id):
+        """
+        Latest reading of one device with ``age_seconds`` and ``stale``, or None.
+        """
+        reading = self._by_device.get(device_id)
+        return self._with_staleness(reading) if reading else None
+
+    def freshest(self):
+        """
+        The most recent reading across all devices, or None.
+        """
+        return self._with_staleness(self._freshest) if self._freshest else None
+
+    def all(self):
+        now = datetime.now(timezone.utc)
+        return [self._with_staleness(reading, now) for reading in self._by_device.values()]
+
+    async def refresh(self):
+        """
+        Resync from sensor_latest, picking up writes made by other workers.
+        """
+        async with get_db_connection() as conn:
+            rows = await conn.fetch(
+                f"SELECT {', '.join(READING_FIELDS)} FROM sensor_latest"
+            )
+        return self.update([dict(row) for row in rows])
+
+    async def _refresh_loop(self, every):
+        while True:
+            await asyncio.sleep(every)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error refreshing latest readings: {e}")
+
+    async def start(self, refresh_seconds):
+        await self.refresh()
+        if refresh_seconds > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop(refresh_seconds))
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+
+latest_readings = LatestReadings(
+    settings.SENSOR_INTERVAL_SECONDS,
+    settings.SENSOR_STALE_AFTER_INTERVALS,
+    settings.SENSOR_MAX_CLOCK_SKEW_SECONDS,
+)
+
+# Keeps one row per device, newest reading wins; fed from each ingested batch.
+# A row dated beyond the clock skew (stored before timestamps were validated)
+# is replaced by the next reading instead of pinning the device forever.
+UPSERT_LATEST_SQL = """
+    INSERT INTO sensor_latest AS l (device_id, timestamp, pm1_0, pm2_5, pm10, no2, latitude, longitude)
+    SELECT DISTINCT ON (device_id) device_id, ts, pm1_0, pm2_5, pm10, no2, latitude, longitude
+    FROM unnest($1::text[], $2::timestamptz[], $3::float8[], $4::float8[], $5::float8[], $6::float8[], $7::float8[], $8::float8[])
+        AS t(device_id, ts, pm1_0, pm2_5, pm10, no2, latitude, longitude)
+    ORDER BY device_id, ts DESC
+    ON CONFLICT (device_id) DO UPDATE SET
+        timestamp = EXCLUDED.timestamp,
+        pm1_0 = EXCLUDED.pm1_0,
+        pm2_5 = EXCLUDED.pm2_5,
+        pm10 = EXCLUDED.pm10,
+        no2 = EXCLUDED.no2,
+        latitude = EXCLUDED.latitude,
+        longitude = EXCLUDED.longitude
+    WHERE l.timestamp < EXCLUDED.timestamp
+        OR l.timestamp > now() + make_interval(secs => $9)
+"""
+
+async def store_latest(conn, records):
+    """
+    Upsert each device's newest reading of a batch into sensor_latest. Call
+    inside the transaction that stores the raw readings.
+
+    Args:
+        conn: An asyncpg connection.
+        records (list): Tuples in READING_FIELDS order.
+    """
+    await conn.execute(UPSERT_LATEST_SQL, *zip(*records), settings.SENSOR_MAX_CLOCK_SKEW_SECONDS)
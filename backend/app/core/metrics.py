@@ -0,0 +1,263 @@
+import random
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from .config import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self):
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+class Gauge:
+    """
+    Gauge read from a callback at scrape time. The callback returns a number,
+    or a dict mapping label-value tuples to numbers.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, function, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.function = function
+        self.labelnames = tuple(labelnames)
+
+    def render(self):
+        try:
+            value = self.function()
+        except Exception as e:
+            print(f"Error reading gauge {self.name}: {e}")
+            return
+        values = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, v in values:
+            if v is not None:
+                yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}"
+
+class Registry:
+    """
+    In-process metric registry rendered in the Prometheus text format.
+    Metrics are per worker process; scrape each worker or run one worker
+    per container.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(f"{self.prefix}_{name}", documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(f"{self.prefix}_{name}", documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, function, labelnames=()):
+        return self._register(Gauge(f"{self.prefix}_{name}", documentation, function, labelnames))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry("airqi")
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+http_latency = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")
+)
+db_query_latency = registry.histogram(
+    "db_query_duration_seconds", "Database query latency by call site.", ("call_site", "operation")
+)
+db_query_errors = registry.counter(
+    "db_query_errors_total", "Failed database queries by call site.", ("call_site",)
+)
+db_acquire_latency = registry.histogram(
+    "db_acquire_duration_seconds", "Time spent waiting for a pooled connection."
+)
+span_latency = registry.histogram(
+    "span_duration_seconds", "Duration of instrumented operations.", ("span",)
+)
+
+# Spans and queries of the current request, kept for the slow-request log
+_request_trace = ContextVar("request_trace", default=None)
+
+def _trace(name, seconds):
+    trace = _request_trace.get()
+    if trace is not None:
+        trace.append((name, seconds))
+
+@contextmanager
+def span(name):
+    """
+    Time a block of work into span_duration_seconds{span=name}. Works in
+    sync code, async code and worker threads.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        span_latency.observe(elapsed, name)
+        _trace(name, elapsed)
+
+def call_site(depth=2):
+    """
+    Name the application function ("module.function") that issued a call,
+    skipping asyncpg's own frames.
+    """
+    frame = sys._getframe(depth)
+    while frame is not None and frame.f_globals.get("__name__", "").startswith("asyncpg"):
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+def observe_query(site, operation, elapsed, failed):
+    db_query_latency.observe(elapsed, site, operation)
+    if failed:
+        db_query_errors.inc(site)
+    _trace(f"db:{site}", elapsed)
+
+def route_label(scope):
+    """
+    Route template of a matched request, e.g. /aqi/feed/station/{station_id},
+    so raw ids never become label values.
+    """
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        return "unmatched"
+    regex = getattr(route, "path_regex", None)
+    if regex is not None and not regex.match(scope["path"]):
+        # Some FastAPI versions report the route as declared on its router,
+        # without the include prefix; recover the prefix from the raw path
+        match = re.search(regex.pattern.lstrip("^"), scope["path"])
+        if match:
+            path = scope["path"][:match.start()] + path
+    return path
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route request counts and latency, and
+    logging a sample of slow requests with their span breakdown.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        trace = []
+        token = _request_trace.set(trace)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_trace.reset(token)
+            route = route_label(scope)
+            method = scope["method"]
+            http_requests.inc(method, route, str(status_code))
+            http_latency.observe(elapsed, method, route)
+            if (
+                settings.SLOW_REQUEST_SECONDS > 0
+                and elapsed >= settings.SLOW_REQUEST_SECONDS
+                and random.random() < settings.SLOW_REQUEST_SAMPLE_RATE
+            ):
+                breakdown = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in trace)
+                print(f"Slow request {method} {route} {status_code} {elapsed * 1000:.1f}ms [{breakdown}]")
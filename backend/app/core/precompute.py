@@ -0,0 +1,246 @@
+import asyncio
+import random
+from fastapi import HTTPException, status
+from .config import settings
+from .recommendation import fetch_air_snapshot, profile_record, recommendation_cache, recommendation_fingerprint
+from ..db.database import get_db_connection
+
+# Only one bulk run at a time across all workers and CLI invocations
+PRECOMPUTE_LOCK_ID = 72_410_024
+
+# Keyset paging start; every UUID sorts after it
+FIRST_USER_ID = "00000000-0000-0000-0000-000000000000"
+
+PAGE_QUERY = """
+    SELECT a.user_id, a.severity, a.symptoms, a.trigger_factors, a.report_pdf_url,
+        a.allergies, a.checkup_frequency, a.last_attack_date,
+        r.fingerprint AS stored_fingerprint
+    FROM asthma_data a
+    LEFT JOIN recommendations r ON r.user_id = a.user_id
+    WHERE a.user_id > $1
+    ORDER BY a.user_id
+    LIMIT $2
+"""
+
+STORE_QUERY = """
+    INSERT INTO recommendations (user_id, fingerprint, recommendations, generated_at)
+    VALUES ($1, $2, $3, now())
+    ON CONFLICT (user_id) DO UPDATE
+    SET fingerprint = EXCLUDED.fingerprint,
+        recommendations = EXCLUDED.recommendations,
+        generated_at = EXCLUDED.generated_at
+"""
+
+COUNTERS = ("processed", "generated", "reused", "failed")
+
+class RecommendationPrecompute:
+    """
+    Generates and stores recommendations for every user with an asthma
+    profile, so on-demand requests become a stored read.
+
+    Users are walked in user_id order one page at a time. Each page shares one
+    pollutant snapshot, and progress is checkpointed in precompute_runs after
+    every page, so an interrupted run resumes from the last stored page.
+    Users whose stored fingerprint still matches are skipped.
+
+    Args:
+        generate: Coroutine function called with user_id, user_record and
+            fingerprint; returns a dict with the recommendations.
+        page_size (int): Users fetched and checkpointed per page.
+        concurrency (int): Users generated at once; model calls are further
+            capped by the generator itself.
+        max_attempts (int): Tries per user before it is counted as failed.
+        backoff_seconds (float): Base delay of the exponential backoff.
+    """
+
+    def __init__(self, generate, page_size, concurrency, max_attempts, backoff_seconds):
+        self.generate = generate
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def _open_run(self, conn, force, resume):
+        if resume:
+            # A run left "running" belonged to a process that died holding the lock
+            run = await conn.fetchrow(
+                """
+                SELECT * FROM precompute_runs
+                WHERE status IN ('running', 'interrupted')
+                ORDER BY id DESC LIMIT 1
+                """
+            )
+            if run is not None:
+                return await conn.fetchrow(
+                    "UPDATE precompute_runs SET status = 'running', updated_at = now() "
+                    "WHERE id = $1 RETURNING *",
+                    run["id"],
+                )
+        await conn.execute(
+            "UPDATE precompute_runs SET status = 'abandoned', updated_at = now() "
+            "WHERE status IN ('running', 'interrupted')"
+        )
+        return await conn.fetchrow(
+            "INSERT INTO precompute_runs (force) VALUES ($1) RETURNING *", force
+        )
+
+    async def _generate(self, user_id, user_record, fingerprint, slots):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                async with slots:
+                    result = await self.generate(
+                        user_id=user_id, user_record=user_record, fingerprint=fingerprint
+                    )
+                return result["recommendations"]
+            except HTTPException as e:
+                # Missing report or profile: retrying cannot help
+                print(f"Skipping recommendations for {user_id}: {e.detail}")
+                return None
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    print(f"Giving up on recommendations for {user_id} after {attempt} attempts: {e}")
+                    return None
+                # Exponential backoff with jitter so retries do not arrive in lockstep
+                delay = self.backoff_seconds * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                await asyncio.sleep(delay)
+
+    async def _process(self, row, sensor_data, force, slots):
+        user_id = row["user_id"]
+        user_record = profile_record(row, sensor_data)
+        fingerprint = recommendation_fingerprint(user_id, user_record)
+        if not force:
+            if row["stored_fingerprint"] == fingerprint:
+                return "reused", None
+            if settings.RECOMMENDATION_CACHE_ENABLED:
+                recommendations = recommendation_cache.get(fingerprint)
+                if recommendations is not None:
+                    return "reused", (user_id, fingerprint, recommendations)
+        recommendations = await self._generate(user_id, user_record, fingerprint, slots)
+        if recommendations is None:
+            return "failed", None
+        return "generated", (user_id, fingerprint, recommendations)
+
+    async def run(self, force=False, resume=True):
+        """
+        Run (or resume) a bulk precompute to completion.
+
+        Args:
+            force (bool): Regenerate even when the stored fingerprint matches.
+                A resumed run keeps the setting it was started with.
+            resume (bool): Continue the last unfinished run instead of
+                starting over.
+
+        Returns:
+            dict: The finished precompute_runs row.
+        """
+        async with get_db_connection() as conn:
+            # The connection holding the lock also carries the run's queries
+            if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", PRECOMPUTE_LOCK_ID):
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A recommendation precompute is already running"
+                )
+            try:
+                run = await self._open_run(conn, force, resume)
+                return await self._run_pages(conn, run)
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", PRECOMPUTE_LOCK_ID)
+
+    async def _run_pages(self, conn, run):
+        run_id, force = run["id"], run["force"]
+        cursor = run["last_user_id"] or FIRST_USER_ID
+        slots = asyncio.Semaphore(self.concurrency)
+        print(f"Precompute run {run_id} starting after user {cursor}")
+        try:
+            while True:
+                rows = await conn.fetch(PAGE_QUERY, cursor, self.page_size)
+                if not rows:
+                    break
+                # One pollutant snapshot per page instead of one query per user
+                sensor_data = await fetch_air_snapshot(conn)
+                outcomes = await asyncio.gather(
+                    *(self._process(row, sensor_data, force, slots) for row in rows)
+                )
+                counts = dict.fromkeys(COUNTERS, 0)
+                counts["processed"] = len(rows)
+                results = []
+                for outcome, result in outcomes:
+                    counts[outcome] += 1
+                    if result is not None:
+                        results.append(result)
+                cursor = rows[-1]["user_id"]
+                async with conn.transaction():
+                    if results:
+                        await conn.executemany(STORE_QUERY, results)
+                    run = await conn.fetchrow(
+                        """
+                        UPDATE precompute_runs
+                        SET last_user_id = $2, processed = processed + $3, generated = generated + $4,
+                            reused = reused + $5, failed = failed + $6, updated_at = now()
+                        WHERE id = $1
+                        RETURNING *
+                        """,
+                        run_id, cursor, *(counts[c] for c in COUNTERS),
+                    )
+                print(
+                    f"Precompute run {run_id}: {run['processed']} users "
+                    f"({run['generated']} generated, {run['reused']} reused, {run['failed']} failed)"
+                )
+        except asyncio.CancelledError:
+            await asyncio.shield(self._finish(conn, run_id, "interrupted"))
+            raise
+        except Exception as e:
+            await self._finish(conn, run_id, "failed", str(e))
+            raise
+        return dict(await self._finish(conn, run_id, "completed"))
+
+    async def _finish(self, conn, run_id, state, error=None):
+        finished = state != "interrupted"
+        return await conn.fetchrow(
+            """
+            UPDATE precompute_runs
+            SET status = $2, error = $3, updated_at = now(),
+                finished_at = CASE WHEN $4 THEN now() END
+            WHERE id = $1
+            RETURNING *
+            """,
+            run_id, state, error, finished,
+        )
+
+    def start(self, force=False, resume=True):
+        """
+        Launch run() in the background of this worker.
+        """
+        if self.running:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A recommendation precompute is already running"
+            )
+        self._task = asyncio.create_task(self._run_logged(force, resume))
+
+    async def _run_logged(self, force, resume):
+        try:
+            await self.run(force=force, resume=resume)
+        except HTTPException as e:
+            print(f"Precompute not started: {e.detail}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Precompute failed: {e}")
+
+    async def latest_run(self):
+        async with get_db_connection() as conn:
+            run = await conn.fetchrow("SELECT * FROM precompute_runs ORDER BY id DESC LIMIT 1")
+        return dict(run) if run else None
+
+    async def stop(self):
+        # Cancelling marks the run interrupted, so the next start resumes it
+        if self.running:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
@@ -1,114 +1,174 @@
-import os
-import psycopg2
-from psycopg2 import sql
-from dotenv import load_dotenv
+import hashlib
+import json
+from bisect import bisect_left
+import asyncpg
+from .cache import TTLCache
+from .config import settings
+from .latest import latest_readings
+from ..db.database import acquire_db_connection, release_db_connection
+
+# Generated recommendations keyed by recommendation_fingerprint()
+recommendation_cache = TTLCache(
+    settings.RECOMMENDATION_CACHE_MAX_SIZE, settings.RECOMMENDATION_CACHE_TTL_SECONDS
+)
+
+PROFILE_FIELDS = (
+    "severity", "symptoms", "trigger_factors", "report_pdf_url",
+    "allergies", "checkup_date", "last_attack_date",
+)
+
+def pollutant_band(value, edges):
+    """
+    Quantize a pollutant reading into a band index.
+
+    Args:
+        value (float): The reading, or None if the sensor did not report it.
+        edges (list): Ascending upper edges of each band.
+
+    Returns:
+        int: The band index, or None for a missing reading.
+    """
+    if value is None:
+        return None
+    return bisect_left(edges, value)
+
+def recommendation_fingerprint(user_id, user_record, bands=None):
+    """
+    Build a cache key that changes only when the patient's profile changes or
+    a pollutant moves into a different band.
+
+    Args:
+        user_id (str): The ID of the user.
+        user_record (dict): The record returned by fetch_latest_user_record.
+        bands (dict, optional): Band edges per pollutant, defaults to
+            settings.RECOMMENDATION_BANDS.
+
+    Returns:
+        str: A hex digest identifying the recommendation inputs.
+    """
+    bands = bands if bands is not None else settings.RECOMMENDATION_BANDS
+    sensor_data = user_record.get("sensor_data") or {}
+    payload = {
+        "user_id": str(user_id),
+        "profile": {field: user_record.get(field) for field in PROFILE_FIELDS},
+        "bands": {
+            pollutant: pollutant_band(sensor_data.get(pollutant), edges)
+            for pollutant, edges in sorted(bands.items())
+        },
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+SENSOR_QUERY = """
+    SELECT pm1_0, pm2_5, pm10, no2
+    FROM sensor_data
+    -- Readings dated beyond the clock skew are device clock errors
+    WHERE timestamp <= now() + make_interval(secs => $1)
+    ORDER BY timestamp DESC
+    LIMIT 1;
+"""
+
+def pollutant_snapshot(reading):
+    if not reading:
+        return None
+    return {p: reading[p] for p in ("pm1_0", "pm2_5", "pm10", "no2")}
+
+async def fetch_air_snapshot(connection):
+    """
+    Freshest reading across all devices. Served from the in-memory index;
+    falls back to sensor_data when no device has reported through ingestion yet.
+
+    Returns:
+        dict: pm1_0, pm2_5, pm10 and no2, or None if there are no readings.
+    """
+    reading = latest_readings.freshest()
+    if reading is None:
+        reading = await connection.fetchrow(SENSOR_QUERY, settings.SENSOR_MAX_CLOCK_SKEW_SECONDS)
+    return pollutant_snapshot(reading)
+
+def profile_record(row, sensor_data):
+    """
+    Shape an asthma_data row and a pollutant snapshot into the record the
+    recommendation pipeline consumes.
+    """
+    return {
+        "severity": row["severity"],
+        "symptoms": row["symptoms"],
+        "trigger_factors": row["trigger_factors"],
+        "report_pdf_url": row["report_pdf_url"],
+        "allergies": row["allergies"],
+        "checkup_date": row["checkup_frequency"],
+        "last_attack_date": row["last_attack_date"],
+        "sensor_data": sensor_data,
+    }
 
 class DatabaseManager:
-    def __init__(self):
-        # Load environment variables from .env file
-        load_dotenv()
+    """
+    Reads a user's profile and latest sensor data for recommendations.
+    Connection settings come from settings via the shared pool.
+    """
 
-        # Retrieve database credentials from environment variables
-        self.DB_HOST = os.getenv("DB_HOST")
-        self.DB_NAME = os.getenv("DB_NAME")
-        self.DB_USER = os.getenv("DB_USER")
-        self.DB_PASSWORD = os.getenv("DB_PASSWORD")
+    async def connect_to_database(self):
+        """
+        Borrow a connection from the shared PostgreSQL pool.
 
-        if not all([self.DB_HOST, self.DB_NAME, self.DB_USER, self.DB_PASSWORD]):
-            raise ValueError("Database credentials are not set in the .env file")
+        Returns:
+            connection: A pooled asyncpg connection. Hand it back with
+            release_connection() once done.
+        """
+        return await acquire_db_connection()
 
-    def connect_to_database(self):
+    async def release_connection(self, connection):
         """
-        Create a connection to the PostgreSQL database.
+        Return a borrowed connection to the shared pool.
 
-        Returns:
-            connection: A psycopg2 connection object.
+        Args:
+            connection: The connection obtained from connect_to_database().
         """
-        try:
-            connection = psycopg2.connect(
-                host=self.DB_HOST,
-                database=self.DB_NAME,
-                user=self.DB_USER,
-                password=self.DB_PASSWORD
-            )
-            print("Connected to the database!")
-            return connection
-        except psycopg2.Error as e:
-            print(f"Error connecting to the database: {e}")
-            raise
+        await release_db_connection(connection)
 
-    def fetch_latest_user_record(self, user_id):
+    async def fetch_latest_user_record(self, user_id, device_id=None):
         """
         Fetch the latest record for a user based on the created_at column and the latest sensor data.
 
         Args:
             user_id (int): The ID of the user.
+            device_id (str, optional): Use this device's latest reading instead
+                of the freshest reading across all devices.
 
         Returns:
             dict: A dictionary containing the latest user record fields and sensor data, or None if no record is found.
         """
         user_query = """
-            SELECT severity, symptoms, trigger_factors, report_pdf_url, allergies, checkup_frequency, last_attack_date
-            FROM asthma_data
-            WHERE user_id = %s
-            ORDER BY created_at DESC
-            LIMIT 1;
-        """
-
-        sensor_query = """
-            SELECT pm1_0, pm2_5, pm10, no2
-            FROM sensor_data
-            ORDER BY timestamp DESC
+            SELECT a.severity, a.symptoms, a.trigger_factors, a.report_pdf_url, a.allergies,
+                a.checkup_frequency, a.last_attack_date,
+                r.fingerprint AS stored_fingerprint, r.recommendations AS stored_recommendations
+            FROM asthma_data a
+            LEFT JOIN recommendations r ON r.user_id = a.user_id
+            WHERE a.user_id = $1
+            ORDER BY a.created_at DESC
             LIMIT 1;
         """
 
+        connection = await self.connect_to_database()
         try:
-            # Connect to the database
-            connection = self.connect_to_database()
-            cursor = connection.cursor()
-
             # Fetch the latest user record
-            cursor.execute(user_query, (user_id,))
-            user_result = cursor.fetchone()
-
-            # Fetch the latest sensor data
-            cursor.execute(sensor_query)
-            sensor_result = cursor.fetchone()
-
-            # Close the cursor and connection
-            cursor.close()
-            connection.close()
-
-            # Map the user result to a dictionary if a record is found
-            if user_result:
-                user_data = {
-                    "severity": user_result[0],
-                    "symptoms": user_result[1],
-                    "trigger_factors": user_result[2],
-                    "report_pdf_url": user_result[3],
-                    "allergies": user_result[4],
-                    "checkup_date": user_result[5],
-                    "last_attack_date": user_result[6],
-                }
-            else:
-                user_data = None
-
-            # Map the sensor result to a dictionary if data is found
-            if sensor_result:
-                sensor_data = {
-                    "pm1_0": sensor_result[0],
-                    "pm2_5": sensor_result[1],
-                    "pm10": sensor_result[2],
-                    "no2": sensor_result[3],
-                }
-            else:
-                sensor_data = None
+            user_result = await connection.fetchrow(user_query, user_id)
+            if not user_result:
+                return None
 
-            # Combine user data and sensor data
-            if user_data:
-                user_data["sensor_data"] = sensor_data
+            if device_id is not None:
+                sensor_data = pollutant_snapshot(latest_readings.get(device_id))
+            else:
+                sensor_data = await fetch_air_snapshot(connection)
 
+            user_data = profile_record(user_result, sensor_data)
+            # Last precomputed answer; only reused while its fingerprint matches
+            user_data["stored_fingerprint"] = user_result["stored_fingerprint"]
+            user_data["stored_recommendations"] = user_result["stored_recommendations"]
             return user_data
-        except psycopg2.Error as e:
+        except asyncpg.PostgresError as e:
             print(f"Error fetching user or sensor data: {e}")
             raise
+        finally:
+            await self.release_connection(connection)
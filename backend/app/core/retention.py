@@ -0,0 +1,54 @@
+import asyncio
+from .config import settings
+from ..db.database import get_db_connection
+
+EXPIRE_INGEST_BATCHES_SQL = """
+    DELETE FROM sensor_ingest_batches
+    WHERE received_at < now() - make_interval(hours => $1)
+"""
+
+class IngestKeySweeper:
+    """
+    Periodically deletes expired idempotency keys from sensor_ingest_batches.
+
+    A key only has to outlive a device's retries of the same batch, so keys
+    older than ``retention_hours`` are dropped; a batch resent after that is
+    stored again. Every worker sweeps; the delete is idempotent.
+
+    Args:
+        retention_hours (float): Hours an idempotency key is kept.
+    """
+
+    def __init__(self, retention_hours):
+        self.retention_hours = retention_hours
+        self._task = None
+
+    async def sweep(self):
+        """
+        Delete expired keys.
+
+        Returns:
+            str: asyncpg's command status, e.g. "DELETE 12".
+        """
+        async with get_db_connection() as conn:
+            return await conn.execute(EXPIRE_INGEST_BATCHES_SQL, float(self.retention_hours))
+
+    async def _sweep_loop(self, every):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Error expiring ingestion idempotency keys: {e}")
+            await asyncio.sleep(every)
+
+    async def start(self, sweep_seconds):
+        if sweep_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._sweep_loop(sweep_seconds))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+ingest_key_sweeper = IngestKeySweeper(settings.SENSOR_IDEMPOTENCY_RETENTION_HOURS)
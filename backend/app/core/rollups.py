@@ -0,0 +1,148 @@
+from datetime import timedelta
+from .config import settings
+
+POLLUTANTS = ("pm1_0", "pm2_5", "pm10", "no2")
+
+# (name, date_trunc unit, bucket width), finest first
+RESOLUTIONS = (
+    ("1m", "minute", timedelta(minutes=1)),
+    ("1h", "hour", timedelta(hours=1)),
+    ("1d", "day", timedelta(days=1)),
+)
+
+def rollup_table(name):
+    return f"sensor_rollup_{name}"
+
+def rollup_table_ddl(name):
+    stats = ",\n".join(
+        f"    {p}_min DOUBLE PRECISION,\n"
+        f"    {p}_max DOUBLE PRECISION,\n"
+        f"    {p}_sum DOUBLE PRECISION NOT NULL DEFAULT 0,\n"
+        f"    {p}_count INTEGER NOT NULL DEFAULT 0"
+        for p in POLLUTANTS
+    )
+    return f"""
+CREATE TABLE IF NOT EXISTS {rollup_table(name)} (
+    device_id TEXT NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL,
+{stats},
+    PRIMARY KEY (device_id, bucket)
+);
+"""
+
+def _upsert_sql(name, unit):
+    columns = ", ".join(
+        f"{p}_min, {p}_max, {p}_sum, {p}_count" for p in POLLUTANTS
+    )
+    aggregates = ", ".join(
+        f"min({p}), max({p}), COALESCE(sum({p}), 0), count({p})" for p in POLLUTANTS
+    )
+    updates = ",\n        ".join(
+        f"{p}_min = LEAST(r.{p}_min, EXCLUDED.{p}_min), "
+        f"{p}_max = GREATEST(r.{p}_max, EXCLUDED.{p}_max), "
+        f"{p}_sum = r.{p}_sum + EXCLUDED.{p}_sum, "
+        f"{p}_count = r.{p}_count + EXCLUDED.{p}_count"
+        for p in POLLUTANTS
+    )
+    # Aggregate the batch server-side and merge it into existing buckets.
+    # Rows are inserted in key order so concurrent batches cannot deadlock.
+    return f"""
+    INSERT INTO {rollup_table(name)} AS r (device_id, bucket, {columns})
+    SELECT device_id, date_trunc('{unit}', ts, 'UTC') AS bucket, {aggregates}
+    FROM unnest($1::text[], $2::timestamptz[], $3::float8[], $4::float8[], $5::float8[], $6::float8[])
+        AS t(device_id, ts, pm1_0, pm2_5, pm10, no2)
+    GROUP BY 1, 2
+    ORDER BY 1, 2
+    ON CONFLICT (device_id, bucket) DO UPDATE SET
+        {updates}
+    """
+
+UPSERT_SQL = {name: _upsert_sql(name, unit) for name, unit, _ in RESOLUTIONS}
+
+async def update_rollups(conn, records):
+    """
+    Fold a batch of readings into every rollup table. Call inside the
+    transaction that stores the raw readings.
+
+    Args:
+        conn: An asyncpg connection.
+        records (list): Tuples of (device_id, timestamp, pm1_0, pm2_5, pm10, no2, ...).
+    """
+    columns = list(zip(*(record[:6] for record in records)))
+    for name, _, _ in RESOLUTIONS:
+        await conn.execute(UPSERT_SQL[name], *columns)
+
+def choose_resolution(start, end, max_points):
+    """
+    Pick the finest resolution whose number of points over the window stays
+    within max_points; raw readings qualify when the window is short enough.
+
+    Returns:
+        tuple: (name, bucket width); name is "raw" for unaggregated readings.
+    """
+    window = end - start
+    raw_interval = timedelta(seconds=settings.SENSOR_INTERVAL_SECONDS)
+    if window / raw_interval <= max_points:
+        return "raw", raw_interval
+    for name, _, width in RESOLUTIONS:
+        if window / width <= max_points:
+            return name, width
+    name, _, width = RESOLUTIONS[-1]
+    return name, width
+
+def _stats_select(name):
+    if name == "raw":
+        return ", ".join(
+            f"{p} AS {p}_min, {p} AS {p}_max, {p} AS {p}_mean, "
+            f"CASE WHEN {p} IS NULL THEN 0 ELSE 1 END AS {p}_count"
+            for p in POLLUTANTS
+        )
+    return ", ".join(
+        f"{p}_min, {p}_max, "
+        f"CASE WHEN {p}_count > 0 THEN {p}_sum / {p}_count END AS {p}_mean, {p}_count"
+        for p in POLLUTANTS
+    )
+
+async def fetch_history(conn, device_id, start, end, max_points):
+    """
+    Return a device's pollutant history over [start, end) at the resolution
+    chosen by choose_resolution().
+
+    Returns:
+        dict: ``resolution`` and ``points``; each point has a ``time`` and
+        min/max/mean/count per pollutant.
+    """
+    name, _ = choose_resolution(start, end, max_points)
+    if name == "raw":
+        query = f"""
+            SELECT timestamp AS time, {_stats_select(name)}
+            FROM sensor_data
+            WHERE device_id = $1 AND timestamp >= $2 AND timestamp < $3
+            ORDER BY timestamp
+            LIMIT $4
+        """
+    else:
+        query = f"""
+            SELECT bucket AS time, {_stats_select(name)}
+            FROM {rollup_table(name)}
+            WHERE device_id = $1 AND bucket >= $2 AND bucket < $3
+            ORDER BY bucket
+            LIMIT $4
+        """
+    rows = await conn.fetch(query, device_id, start, end, max_points)
+    points = [
+        {
+            "time": row["time"],
+            **{
+                p: {
+                    "min": row[f"{p}_min"],
+                    "max": row[f"{p}_max"],
+                    "mean": row[f"{p}_mean"],
+                    "count": row[f"{p}_count"],
+                }
+                for p in POLLUTANTS
+            },
+        }
+        for row in rows
+    ]
+    return {"device_id": device_id, "resolution": name, "points": points}
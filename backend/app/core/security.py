@@ -1,11 +1,23 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from .config import settings
+from .metrics import span
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
+
+# bcrypt releases the GIL, so a small thread pool hashes in parallel while
+# keeping the event loop free and capping CPU spent on password work
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt"
+)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -13,6 +25,41 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def _timed_verify_and_update(plain_password, hashed_password):
+    with span("password_verify"):
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+
+def _timed_hash(password):
+    with span("password_hash"):
+        return pwd_context.hash(password)
+
+async def verify_and_update_password(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password off the event loop.
+
+    Returns:
+        tuple: (verified, new_hash). new_hash is set when the stored hash uses
+        an outdated scheme or work factor and should be replaced.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor,
+        # Carry the request context so the span shows up in slow-request logs
+        contextvars.copy_context().run,
+        _timed_verify_and_update,
+        plain_password,
+        hashed_password,
+    )
+
+async def get_password_hash_async(password) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor, contextvars.copy_context().run, _timed_hash, password
+    )
+
+def shutdown_password_executor():
+    password_executor.shutdown(wait=False, cancel_futures=True)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
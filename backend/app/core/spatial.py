@@ -0,0 +1,225 @@
+import heapq
+import math
+import numpy as np
+from .aqi import AQI_POLLUTANTS, sub_indices
+from .config import settings
+from .geo import haversine_km
+from .latest import latest_readings
+from .waqi import waqi_proxy
+
+KM_PER_DEGREE = 111.19
+
+class SpatialIndex:
+    """
+    Uniform lat/lon grid over station locations.
+
+    Points live in fixed-size cells, so moving a device is an O(1) cell swap,
+    k-nearest searches expand ring by ring around the query cell until no
+    closer point can exist, and bounding-box queries touch only the cells
+    that overlap the box.
+
+    Args:
+        cell_degrees (float): Cell edge length in degrees (0.05 is ~5.5 km).
+    """
+
+    def __init__(self, cell_degrees):
+        self.cell_degrees = cell_degrees
+        # (row, col) -> {id: point}
+        self._cells = {}
+        # id -> point
+        self._points = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, latitude, longitude):
+        return (
+            math.floor(latitude / self.cell_degrees),
+            math.floor(longitude / self.cell_degrees),
+        )
+
+    def upsert(self, point_id, latitude, longitude, **attributes):
+        """
+        Insert a point or move it to a new location.
+        """
+        previous = self._points.get(point_id)
+        cell = self._cell(latitude, longitude)
+        if previous is not None:
+            previous_cell = self._cell(previous["latitude"], previous["longitude"])
+            if previous_cell != cell:
+                self._discard(previous_cell, point_id)
+        point = {"id": point_id, "latitude": latitude, "longitude": longitude, **attributes}
+        self._cells.setdefault(cell, {})[point_id] = point
+        self._points[point_id] = point
+
+    def remove(self, point_id):
+        point = self._points.pop(point_id, None)
+        if point is not None:
+            self._discard(self._cell(point["latitude"], point["longitude"]), point_id)
+
+    def _discard(self, cell, point_id):
+        members = self._cells.get(cell)
+        if members is not None:
+            members.pop(point_id, None)
+            if not members:
+                del self._cells[cell]
+
+    def nearest(self, latitude, longitude, k, max_km=None):
+        """
+        The k points closest to a coordinate, nearest first, each with a
+        ``distance_km`` field.
+        """
+        if not self._points or k <= 0:
+            return []
+        row, col = self._cell(latitude, longitude)
+        found = []
+        ring = 0
+        while True:
+            if 4 * ring * ring > len(self._points):
+                # Sparse neighbourhood: scanning empty cells costs more than all points
+                return self._nearest_scan(latitude, longitude, k, max_km)
+            for cell in self._ring(row, col, ring):
+                for point in self._cells.get(cell, {}).values():
+                    distance = haversine_km(latitude, longitude, point["latitude"], point["longitude"])
+                    if max_km is None or distance <= max_km:
+                        found.append((distance, point))
+            # Every point outside the rings searched so far is at least this far away
+            edge = abs(latitude) + (ring + 1) * self.cell_degrees
+            reach = ring * self.cell_degrees * KM_PER_DEGREE * math.cos(math.radians(min(edge, 89.0)))
+            if max_km is not None and reach > max_km:
+                break
+            if len(found) >= k and reach >= heapq.nsmallest(k, found, key=lambda f: f[0])[-1][0]:
+                break
+            ring += 1
+        return [
+            {**point, "distance_km": round(distance, 3)}
+            for distance, point in heapq.nsmallest(k, found, key=lambda f: f[0])
+        ]
+
+    def _nearest_scan(self, latitude, longitude, k, max_km):
+        distances = (
+            (haversine_km(latitude, longitude, p["latitude"], p["longitude"]), p)
+            for p in self._points.values()
+        )
+        if max_km is not None:
+            distances = (d for d in distances if d[0] <= max_km)
+        return [
+            {**point, "distance_km": round(distance, 3)}
+            for distance, point in heapq.nsmallest(k, distances, key=lambda d: d[0])
+        ]
+
+    @staticmethod
+    def _ring(row, col, ring):
+        if ring == 0:
+            yield (row, col)
+            return
+        for dc in range(-ring, ring + 1):
+            yield (row - ring, col + dc)
+            yield (row + ring, col + dc)
+        for dr in range(-ring + 1, ring):
+            yield (row + dr, col - ring)
+            yield (row + dr, col + ring)
+
+    def within(self, south, west, north, east):
+        """
+        Points inside a bounding box.
+        """
+        min_row, min_col = self._cell(south, west)
+        max_row, max_col = self._cell(north, east)
+        spanned = (max_row - min_row + 1) * (max_col - min_col + 1)
+        if spanned > len(self._cells):
+            cells = (
+                members for (r, c), members in self._cells.items()
+                if min_row <= r <= max_row and min_col <= c <= max_col
+            )
+        else:
+            cells = (
+                self._cells[(r, c)]
+                for r in range(min_row, max_row + 1)
+                for c in range(min_col, max_col + 1)
+                if (r, c) in self._cells
+            )
+        return [
+            point
+            for members in cells
+            for point in members.values()
+            if south <= point["latitude"] <= north and west <= point["longitude"] <= east
+        ]
+
+def cluster_points(points, south, west, north, east, grid):
+    """
+    Group points into a grid x grid raster over the box.
+
+    Returns:
+        list: One dict per non-empty cluster with its centroid, point count
+        and worst AQI.
+    """
+    lat_step = (north - south) / grid or 1.0
+    lon_step = (east - west) / grid or 1.0
+    clusters = {}
+    for point in points:
+        key = (
+            min(int((point["latitude"] - south) / lat_step), grid - 1),
+            min(int((point["longitude"] - west) / lon_step), grid - 1),
+        )
+        cluster = clusters.get(key)
+        if cluster is None:
+            cluster = clusters[key] = {"lat_sum": 0.0, "lon_sum": 0.0, "count": 0, "aqi": None}
+        cluster["lat_sum"] += point["latitude"]
+        cluster["lon_sum"] += point["longitude"]
+        cluster["count"] += 1
+        aqi = point.get("aqi")
+        if aqi is not None and (cluster["aqi"] is None or aqi > cluster["aqi"]):
+            cluster["aqi"] = aqi
+    return [
+        {
+            "latitude": c["lat_sum"] / c["count"],
+            "longitude": c["lon_sum"] / c["count"],
+            "count": c["count"],
+            "aqi": c["aqi"],
+        }
+        for c in clusters.values()
+    ]
+
+station_index = SpatialIndex(settings.SPATIAL_CELL_DEGREES)
+
+def index_readings(readings):
+    located = [r for r in readings if r.get("latitude") is not None and r.get("longitude") is not None]
+    if not located:
+        return
+    concentrations = np.array(
+        [[np.nan if r.get(p) is None else r[p] for p in AQI_POLLUTANTS] for r in located],
+        dtype=np.float64,
+    )
+    indices = sub_indices(concentrations)
+    indices[np.isnan(indices)] = -np.inf
+    aqi = indices.max(axis=1)
+    for reading, value in zip(located, aqi):
+        station_index.upsert(
+            f"device:{reading['device_id']}",
+            reading["latitude"],
+            reading["longitude"],
+            source="device",
+            aqi=round(float(value)) if np.isfinite(value) else None,
+            timestamp=reading["timestamp"],
+        )
+
+def index_waqi_stations(stations):
+    for station in stations:
+        if station.get("uid") is None or station.get("lat") is None or station.get("lon") is None:
+            continue
+        try:
+            aqi = int(station.get("aqi"))
+        except (TypeError, ValueError):
+            aqi = None
+        station_index.upsert(
+            f"waqi:{station['uid']}",
+            station["lat"],
+            station["lon"],
+            source="waqi",
+            aqi=aqi,
+            name=(station.get("station") or {}).get("name"),
+        )
+
+latest_readings.subscribe(index_readings)
+waqi_proxy.subscribe_stations(index_waqi_stations)
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+
+PDF_MAGIC = b"%PDF-"
+# Some mobile pickers send PDFs as octet-stream; the magic bytes decide
+PDF_CONTENT_TYPES = {"application/pdf", "application/x-pdf", "application/octet-stream"}
+# Room for the form's text fields and the multipart framing around a report
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+def report_path(root, digest):
+    """
+    Content-addressed location of a report: <root>/sha256/<ab>/<digest>.pdf.
+    """
+    return os.path.join(root, "sha256", digest[:2], f"{digest}.pdf")
+
+def _publish(tmp_path, final_path):
+    # Identical content is already stored: keep the existing file
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+        return False
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(tmp_path, final_path)
+    return True
+
+def _discard(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+async def store_pdf(upload, root, max_bytes, chunk_size):
+    """
+    Stream an uploaded PDF to content-addressed storage.
+
+    The upload is read in ``chunk_size`` pieces, hashed as it goes and
+    written from a worker thread, so neither the whole file nor the disk
+    writes sit on the event loop. The bytes land in a temporary file that is
+    renamed into place once complete; uploads of an existing report are
+    discarded and point at the stored copy.
+
+    Args:
+        upload (UploadFile): The uploaded file.
+        root (str): Directory holding the reports.
+        max_bytes (int): Largest accepted upload; larger ones get a 413.
+        chunk_size (int): Bytes read and written per step.
+
+    Returns:
+        tuple: (path of the stored file, hex SHA-256 digest, size in bytes).
+    """
+    content_type = (upload.content_type or "").split(";")[0].strip().lower()
+    if content_type not in PDF_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Report must be a PDF"
+        )
+
+    tmp_dir = os.path.join(root, "tmp")
+    await asyncio.to_thread(os.makedirs, tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, f"{uuid.uuid4()}.part")
+    digest = hashlib.sha256()
+    size = 0
+    f = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        try:
+            head = b""
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                if len(head) < len(PDF_MAGIC):
+                    head += chunk[:len(PDF_MAGIC) - len(head)]
+                    if len(head) == len(PDF_MAGIC) and head != PDF_MAGIC:
+                        break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Report exceeds the {max_bytes} byte limit"
+                    )
+                digest.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        finally:
+            await asyncio.to_thread(f.close)
+        if head != PDF_MAGIC:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Report is not a valid PDF"
+            )
+        hex_digest = digest.hexdigest()
+        final_path = report_path(root, hex_digest)
+        await asyncio.to_thread(_publish, tmp_path, final_path)
+        return final_path, hex_digest, size
+    except BaseException:
+        await asyncio.to_thread(_discard, tmp_path)
+        raise
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware refusing request bodies over a per-path limit with a 413.
+
+    Multipart parsing spools every uploaded file to disk whatever its size,
+    so limits enforced after parsing come too late. A declared
+    Content-Length over the limit is refused before the body is read;
+    otherwise the body is counted as it is received and the request fails
+    as soon as it passes the limit.
+
+    Args:
+        app: The wrapped ASGI app.
+        limits (dict): Request path -> largest accepted body in bytes.
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits
+
+    def _too_large(self, limit):
+        return HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request body exceeds the {limit} byte limit"
+        )
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            error = self._too_large(limit)
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside body parsing, so the app answers the 413
+                    raise self._too_large(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,203 @@
+import asyncio
+import time
+import httpx
+from fastapi import HTTPException, status
+from .cache import TTLCache
+from .config import settings
+from .geo import geohash_bounds, geohash_encode
+
+class WaqiProxy:
+    """
+    Caching proxy for the WAQI (api.waqi.info) feed.
+
+    Responses are cached for ``ttl`` seconds and kept for ``stale_ttl``
+    seconds; past ``ttl`` the stale value is served immediately while a
+    single background request refreshes it. Concurrent lookups of the same
+    key share one upstream request. Coordinates are quantized to geohash
+    cells so nearby users hit the same cache entry.
+
+    Args:
+        base_url (str): Upstream base URL; point it at a local fake in tests.
+        token (str): WAQI API token.
+        ttl (float): Seconds a response is served without refreshing.
+        stale_ttl (float): Seconds a response may be served while refreshing.
+        maxsize (int): Maximum number of cached responses.
+        timeout (float): Upstream request timeout in seconds.
+        max_connections (int): Size of the upstream connection pool.
+        transport (httpx.AsyncBaseTransport, optional): Transport for the
+            upstream client, e.g. an httpx.MockTransport in tests.
+    """
+
+    def __init__(self, base_url, token, ttl, stale_ttl, maxsize, timeout, max_connections, transport=None):
+        self.base_url = base_url
+        self.token = token
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.transport = transport
+        # Values are (fetched_at, data); entries expire from the cache at stale_ttl
+        self.cache = TTLCache(maxsize, max(stale_ttl, ttl))
+        self.client = None
+        self._in_flight = {}
+        self._station_listeners = []
+        self.upstream_requests = 0
+        self.coalesced = 0
+        self.stale_served = 0
+
+    def subscribe_stations(self, listener):
+        """
+        Register a callable invoked with the station list of every fresh
+        bounding-box response.
+        """
+        self._station_listeners.append(listener)
+
+    async def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self.transport,
+            )
+
+    async def close(self):
+        for task in list(self._in_flight.values()):
+            task.cancel()
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def _fetch(self, path, params):
+        if not self.token:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="AQI feed is not configured",
+            )
+        if self.client is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="AQI feed is not available",
+            )
+        self.upstream_requests += 1
+        try:
+            response = await self.client.get(path, params={**params, "token": self.token})
+            response.raise_for_status()
+            payload = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            # The request URL carries the token, so don't echo the exception text
+            print(f"Error fetching AQI feed {path}: {type(e).__name__}")
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="AQI feed request failed",
+            )
+        if payload.get("status") != "ok":
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"AQI feed error: {payload.get('data')}",
+            )
+        return payload["data"]
+
+    async def _fetch_and_store(self, key, path, params):
+        data = await self._fetch(path, params)
+        self.cache.set(key, (time.monotonic(), data))
+        if key.startswith("bounds:"):
+            for listener in self._station_listeners:
+                try:
+                    listener(data)
+                except Exception as e:
+                    print(f"Error in AQI station listener: {e}")
+        return data
+
+    def _on_done(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark failures of background refreshes as retrieved
+        if not task.cancelled():
+            task.exception()
+
+    def _refresh(self, key, path, params):
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+        task = asyncio.create_task(self._fetch_and_store(key, path, params))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda t: self._on_done(key, t))
+        return task
+
+    async def get(self, key, path, params=None):
+        """
+        Return the cached upstream ``data`` for ``key``, fetching it if needed.
+        """
+        params = params or {}
+        entry = self.cache.get(key)
+        if entry is not None:
+            fetched_at, data = entry
+            if time.monotonic() - fetched_at >= self.ttl:
+                self.stale_served += 1
+                self._refresh(key, path, params)
+            return data
+        # Shielded so one client disconnecting doesn't cancel the shared request
+        return await asyncio.shield(self._refresh(key, path, params))
+
+    async def station(self, station_id):
+        return await self.get(f"station:{station_id}", f"/feed/@{station_id}/")
+
+    async def nearest(self, latitude, longitude):
+        """
+        Feed of the station nearest to a point, shared by every point in the
+        same WAQI_GEO_PRECISION geohash cell.
+        """
+        geohash = geohash_encode(latitude, longitude, settings.WAQI_GEO_PRECISION)
+        min_lat, min_lon, max_lat, max_lon = geohash_bounds(geohash)
+        center = f"{(min_lat + max_lat) / 2:.5f};{(min_lon + max_lon) / 2:.5f}"
+        return await self.get(f"geo:{geohash}", f"/feed/geo:{center}/")
+
+    async def bounds(self, lat1, lng1, lat2, lng2):
+        """
+        Stations inside a bounding box. The upstream request covers the box
+        expanded to whole WAQI_BOUNDS_PRECISION geohash cells, and the
+        result is filtered back down to the requested box.
+        """
+        south, north = sorted((lat1, lat2))
+        west, east = sorted((lng1, lng2))
+        precision = settings.WAQI_BOUNDS_PRECISION
+        sw = geohash_encode(south, west, precision)
+        ne = geohash_encode(north, east, precision)
+        cell_south, cell_west = geohash_bounds(sw)[:2]
+        cell_north, cell_east = geohash_bounds(ne)[2:]
+        stations = await self.get(
+            f"bounds:{sw}:{ne}",
+            "/map/bounds/",
+            {"latlng": f"{cell_south},{cell_west},{cell_north},{cell_east}"},
+        )
+        return [
+            s for s in stations
+            if south <= s.get("lat", 91) <= north and west <= s.get("lon", 181) <= east
+        ]
+
+    async def search(self, keyword):
+        keyword = keyword.strip().lower()
+        return await self.get(f"search:{keyword}", "/search/", {"keyword": keyword})
+
+    def stats(self):
+        return {
+            **self.cache.stats(),
+            "upstream_requests": self.upstream_requests,
+            "coalesced": self.coalesced,
+            "stale_served": self.stale_served,
+            "in_flight": len(self._in_flight),
+        }
+
+waqi_proxy = WaqiProxy(
+    settings.WAQI_BASE_URL,
+    settings.WAQI_TOKEN,
+    settings.WAQI_CACHE_TTL_SECONDS,
+    settings.WAQI_STALE_TTL_SECONDS,
+    settings.WAQI_CACHE_MAX_SIZE,
+    settings.WAQI_TIMEOUT_SECONDS,
+    settings.WAQI_MAX_CONNECTIONS,
+)
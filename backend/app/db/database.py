@@ -1,22 +1,179 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import asyncio
+import time
+from contextlib import asynccontextmanager
+import asyncpg
 from fastapi import HTTPException, status
 from ..core.config import settings
+from ..core.metrics import call_site, db_acquire_latency, observe_query
 
-def get_db_connection():
+# Shared asyncpg pool, created at application startup
+db_pool = None
+# Serialises lazy pool creation so concurrent first callers share one pool
+_pool_lock = asyncio.Lock()
+
+def _timed(operation):
+    method = getattr(asyncpg.Connection, operation)
+
+    async def timed(self, *args, **kwargs):
+        if not settings.METRICS_ENABLED:
+            return await method(self, *args, **kwargs)
+        site = call_site()
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = await method(self, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            observe_query(site, operation, time.perf_counter() - started, failed)
+
+    timed.__name__ = operation
+    timed.__doc__ = method.__doc__
+    return timed
+
+class InstrumentedConnection(asyncpg.Connection):
+    """
+    asyncpg connection that times every query by the function issuing it.
+    """
+
+    execute = _timed("execute")
+    executemany = _timed("executemany")
+    fetch = _timed("fetch")
+    fetchrow = _timed("fetchrow")
+    fetchval = _timed("fetchval")
+    copy_records_to_table = _timed("copy_records_to_table")
+
+    _idle_since = None
+
+    def mark_idle(self):
+        self._idle_since = time.monotonic()
+
+    def idle_seconds(self):
+        return time.monotonic() - self._idle_since if self._idle_since is not None else 0.0
+
+async def _init_connection(conn):
+    # Keep ids as plain strings, matching the API schemas
+    await conn.set_type_codec(
+        "uuid", encoder=str, decoder=str, schema="pg_catalog"
+    )
+    conn.mark_idle()
+
+async def init_db_pool():
+    global db_pool
+    if db_pool is not None:
+        return db_pool
+    async with _pool_lock:
+        if db_pool is not None:
+            return db_pool
+        return await _create_pool()
+
+async def _create_pool():
+    global db_pool
     try:
-        conn = psycopg2.connect(
-            dbname=settings.DB_NAME,
+        db_pool = await asyncpg.create_pool(
+            database=settings.DB_NAME,
             user=settings.DB_USER,
             password=settings.DB_PASSWORD,
             host=settings.DB_HOST,
-            port=settings.DB_PORT,
-            cursor_factory=RealDictCursor
+            port=int(settings.DB_PORT) if settings.DB_PORT else None,
+            min_size=settings.DB_POOL_MIN_SIZE,
+            max_size=settings.DB_POOL_MAX_SIZE,
+            # Hot queries are prepared once per connection and reused
+            statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+            init=_init_connection,
+            connection_class=InstrumentedConnection,
+        )
+        return db_pool
+    except Exception as e:
+        print(f"Error creating database pool: {e}")
+        raise
+
+async def close_db_pool():
+    global db_pool
+    if db_pool is not None:
+        await db_pool.close()
+        db_pool = None
+
+async def _is_healthy(conn):
+    """
+    Check a pooled connection before handing it out. Only connections idle
+    for longer than DB_HEALTHCHECK_IDLE_SECONDS are pinged, so the hot path
+    does not pay a round trip per checkout.
+
+    Args:
+        conn: An asyncpg connection taken from the pool.
+
+    Returns:
+        bool: True if the connection is open and, when it has been idle,
+        answers a trivial query.
+    """
+    if conn.is_closed():
+        return False
+    if conn.idle_seconds() < settings.DB_HEALTHCHECK_IDLE_SECONDS:
+        return True
+    try:
+        await conn.fetchval("SELECT 1")
+        return True
+    except (asyncpg.PostgresError, asyncpg.InterfaceError, OSError):
+        return False
+
+async def acquire_db_connection():
+    try:
+        if db_pool is None:
+            await init_db_pool()
+        # Discard dead connections (server restarts, idle timeouts) and retry
+        for _ in range(settings.DB_POOL_MAX_SIZE + 1):
+            started = time.perf_counter()
+            conn = await db_pool.acquire(timeout=settings.DB_POOL_TIMEOUT)
+            db_acquire_latency.observe(time.perf_counter() - started)
+            if await _is_healthy(conn):
+                return conn
+            conn.terminate()
+            await db_pool.release(conn)
+        raise asyncpg.InterfaceError("No healthy connection available")
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database connection pool exhausted"
+        )
+    except HTTPException:
+        raise
+    except OSError as e:
+        # The server is unreachable (the pool could not be created)
+        print(f"Error connecting to database: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database unavailable"
         )
-        return conn
     except Exception as e:
         print(f"Error connecting to database: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Database connection error"
-        ) 
\ No newline at end of file
+        )
+
+async def release_db_connection(conn):
+    if conn is None or db_pool is None:
+        return
+    # asyncpg rolls back any open transaction and resets session state
+    conn.mark_idle()
+    await db_pool.release(conn)
+
+@asynccontextmanager
+async def get_db_connection():
+    """
+    Borrow a pooled connection for the duration of an ``async with`` block.
+    """
+    conn = await acquire_db_connection()
+    try:
+        yield conn
+    finally:
+        await release_db_connection(conn)
+
+async def get_db():
+    """
+    Request-scoped dependency that borrows a pooled connection and returns it
+    once the response is sent.
+    """
+    async with get_db_connection() as conn:
+        yield conn
@@ -0,0 +1,241 @@
+import asyncio
+from .database import close_db_pool, get_db_connection, init_db_pool
+from ..core.rollups import RESOLUTIONS, rollup_table_ddl
+
+# Serialises migrations when several workers start at once
+MIGRATION_LOCK_ID = 72_410_023
+
+# Unique indexes signup relies on to tell duplicate emails from usernames
+USERS_EMAIL_INDEX = "users_email_key"
+USERS_USERNAME_INDEX = "users_username_key"
+
+MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+# Profile tables predate this service on Supabase, so the baseline only
+# creates them on an empty database and leaves existing ones untouched
+PROFILE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id UUID PRIMARY KEY,
+    username TEXT UNIQUE NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    hashed_password TEXT NOT NULL,
+    disabled BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS asthma_data (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    severity TEXT,
+    symptoms TEXT[],
+    trigger_factors TEXT[],
+    allergies TEXT[],
+    checkup_frequency TEXT,
+    last_attack_date TIMESTAMPTZ,
+    report_pdf_url TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+SENSOR_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sensor_data (
+    id BIGSERIAL PRIMARY KEY,
+    device_id TEXT,
+    timestamp TIMESTAMPTZ NOT NULL DEFAULT now(),
+    pm1_0 DOUBLE PRECISION,
+    pm2_5 DOUBLE PRECISION,
+    pm10 DOUBLE PRECISION,
+    no2 DOUBLE PRECISION,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION
+);
+
+ALTER TABLE sensor_data ADD COLUMN IF NOT EXISTS device_id TEXT;
+ALTER TABLE sensor_data ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION;
+ALTER TABLE sensor_data ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+
+-- Per-device history lookups (forecast lag windows, raw history)
+CREATE INDEX IF NOT EXISTS sensor_data_device_timestamp_idx
+    ON sensor_data (device_id, timestamp DESC);
+
+-- Newest reading per device, maintained on ingest
+CREATE TABLE IF NOT EXISTS sensor_latest (
+    device_id TEXT PRIMARY KEY,
+    timestamp TIMESTAMPTZ NOT NULL,
+    pm1_0 DOUBLE PRECISION,
+    pm2_5 DOUBLE PRECISION,
+    pm10 DOUBLE PRECISION,
+    no2 DOUBLE PRECISION,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION
+);
+
+-- Idempotency keys of accepted ingestion batches
+CREATE TABLE IF NOT EXISTS sensor_ingest_batches (
+    idempotency_key TEXT PRIMARY KEY,
+    reading_count INTEGER NOT NULL,
+    received_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+# Incrementally maintained min/max/sum/count per device and time bucket
+ROLLUP_SCHEMA = "".join(rollup_table_ddl(name) for name, _, _ in RESOLUTIONS)
+
+def _unique_index(table, column, name):
+    # Existing databases may already enforce this under another name
+    return f"""
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = '{table}'::regclass
+          AND i.indisunique AND i.indnatts = 1 AND a.attname = '{column}'
+    ) THEN
+        CREATE UNIQUE INDEX {name} ON {table} ({column});
+    END IF;
+END $$;
+"""
+
+HOT_PATH_INDEXES = f"""
+{_unique_index("users", "email", USERS_EMAIL_INDEX)}
+{_unique_index("users", "username", USERS_USERNAME_INDEX)}
+
+-- One form per user: keep the newest row, which is the one every reader
+-- already picked, so the form can be upserted on user_id. Older rows are
+-- patient records: they are moved to asthma_data_archive, not dropped,
+-- and the count is reported in the migration log
+CREATE TABLE IF NOT EXISTS asthma_data_archive (
+    LIKE asthma_data,
+    archived_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+DO $$
+DECLARE
+    moved INTEGER;
+BEGIN
+    WITH duplicates AS (
+        SELECT ctid FROM (
+            SELECT ctid, row_number() OVER (
+                PARTITION BY user_id ORDER BY created_at DESC
+            ) AS rn
+            FROM asthma_data
+        ) ranked
+        WHERE rn > 1
+    ), archived AS (
+        INSERT INTO asthma_data_archive
+        SELECT a.*, now() FROM asthma_data a
+        WHERE a.ctid IN (SELECT ctid FROM duplicates)
+    )
+    DELETE FROM asthma_data
+    WHERE ctid IN (SELECT ctid FROM duplicates);
+    GET DIAGNOSTICS moved = ROW_COUNT;
+    IF moved > 0 THEN
+        RAISE NOTICE 'Moved % older asthma_data row(s) to asthma_data_archive', moved;
+    END IF;
+END $$;
+{_unique_index("asthma_data", "user_id", "asthma_data_user_id_key")}
+
+-- Freshest reading across all devices (fallback before ingestion warms up)
+CREATE INDEX IF NOT EXISTS sensor_data_timestamp_idx
+    ON sensor_data (timestamp DESC);
+"""
+
+RECOMMENDATION_STORE = """
+-- Latest generated recommendation per user, valid while the fingerprint
+-- of its inputs (profile and pollutant bands) still matches
+CREATE TABLE IF NOT EXISTS recommendations (
+    user_id UUID PRIMARY KEY REFERENCES users (id) ON DELETE CASCADE,
+    fingerprint TEXT NOT NULL,
+    recommendations TEXT NOT NULL,
+    generated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Bulk precompute runs; last_user_id is the resume checkpoint
+CREATE TABLE IF NOT EXISTS precompute_runs (
+    id BIGSERIAL PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'running',
+    force BOOLEAN NOT NULL DEFAULT FALSE,
+    last_user_id UUID,
+    processed INTEGER NOT NULL DEFAULT 0,
+    generated INTEGER NOT NULL DEFAULT 0,
+    reused INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    finished_at TIMESTAMPTZ
+);
+"""
+
+ALERT_DEVICES = """
+-- Devices whose readings each user is alerted about
+CREATE TABLE IF NOT EXISTS alert_devices (
+    user_id UUID NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    device_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, device_id)
+);
+"""
+
+# Applied in order, each in its own transaction. Never edit a released
+# migration; append a new one. New rollup resolutions need their own entry.
+MIGRATIONS = [
+    (1, "baseline", PROFILE_SCHEMA + SENSOR_SCHEMA + ROLLUP_SCHEMA),
+    (2, "hot_path_indexes", HOT_PATH_INDEXES),
+    (3, "recommendation_store", RECOMMENDATION_STORE),
+    (4, "alert_devices", ALERT_DEVICES),
+]
+
+async def migrate():
+    """
+    Apply pending migrations and record them in schema_migrations.
+
+    Returns:
+        list: Versions applied by this call.
+    """
+    applied = []
+
+    def log_notice(conn, message):
+        # Migrations report what they changed with RAISE NOTICE
+        print(f"Migration notice: {message.message}")
+
+    async with get_db_connection() as conn:
+        await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_ID)
+        conn.add_log_listener(log_notice)
+        try:
+            await conn.execute(MIGRATIONS_TABLE)
+            done = {r["version"] for r in await conn.fetch("SELECT version FROM schema_migrations")}
+            for version, name, sql in MIGRATIONS:
+                if version in done:
+                    continue
+                async with conn.transaction():
+                    await conn.execute(sql)
+                    await conn.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+                        version, name,
+                    )
+                print(f"Applied migration {version:04d}_{name}")
+                applied.append(version)
+        finally:
+            conn.remove_log_listener(log_notice)
+            await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_ID)
+    return applied
+
+async def _main():
+    await init_db_pool()
+    try:
+        applied = await migrate()
+    finally:
+        await close_db_pool()
+    print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+
+if __name__ == "__main__":
+    # python -m app.db.migrations
+    asyncio.run(_main())
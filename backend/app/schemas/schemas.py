@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, field_validator
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from ..core.config import settings
 
 class Token(BaseModel):
     access_token: str
@@ -39,7 +40,55 @@ class LoginRequest(BaseModel):
 
 class UserWithAsthma(User):
     asthma_data: Optional[AsthmaFormData] = None
+    # Row versions (xmin) and form timestamp; used for ETags, never serialized
+    row_version: Optional[str] = Field(None, exclude=True)
+    asthma_row_version: Optional[str] = Field(None, exclude=True)
+    asthma_created_at: Optional[datetime] = Field(None, exclude=True)
 
 class AsthmaFormStatus(BaseModel):
     has_submitted: bool
-    last_updated: Optional[datetime] = None 
\ No newline at end of file
+    last_updated: Optional[datetime] = None 
+
+class SensorReading(BaseModel):
+    device_id: str = Field(..., min_length=1, max_length=64)
+    timestamp: datetime
+    pm1_0: Optional[float] = Field(None, ge=0)
+    pm2_5: Optional[float] = Field(None, ge=0)
+    pm10: Optional[float] = Field(None, ge=0)
+    no2: Optional[float] = Field(None, ge=0)
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    @field_validator("timestamp")
+    @classmethod
+    def check_timestamp(cls, value):
+        # Devices without an RTC timezone report naive UTC timestamps
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        # A reading from the future would pin sensor_latest, which only
+        # moves forward, until the wall clock caught up with it
+        now = datetime.now(timezone.utc)
+        if value > now + timedelta(seconds=settings.SENSOR_MAX_CLOCK_SKEW_SECONDS):
+            raise ValueError("timestamp is in the future; check the device clock")
+        if value < now - timedelta(days=settings.SENSOR_MAX_READING_AGE_DAYS):
+            raise ValueError(
+                f"timestamp is more than {settings.SENSOR_MAX_READING_AGE_DAYS:g} days old; check the device clock"
+            )
+        return value
+
+class SensorBatch(BaseModel):
+    readings: List[SensorReading] = Field(..., min_length=1)
+
+class AlertDevices(BaseModel):
+    device_ids: List[str] = Field(..., max_length=settings.ALERT_MAX_DEVICES_PER_USER)
+
+    @field_validator("device_ids")
+    @classmethod
+    def check_device_ids(cls, value):
+        if any(not 1 <= len(device_id) <= 64 for device_id in value):
+            raise ValueError("device ids must be 1 to 64 characters")
+        return sorted(set(value))
+
+class SensorIngestResult(BaseModel):
+    accepted: int
+    duplicate: bool = False
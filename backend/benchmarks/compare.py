@@ -0,0 +1,57 @@
+"""
+Compare two load-test result files and flag latency regressions:
+
+    python benchmarks/compare.py results/base.json results/head.json --threshold 10
+
+Exits with status 1 when any endpoint's p95 got worse by more than
+--threshold percent, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+
+def change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old * 100
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed p95 regression in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"baseline  {baseline.get('commit')}  {baseline.get('timestamp')}")
+    print(f"candidate {candidate.get('commit')}  {candidate.get('timestamp')}")
+    print(f"{'endpoint':<16}" + "".join(f"{m:>24}" for m in METRICS))
+
+    regressions = []
+    for name in sorted(set(baseline["endpoints"]) | set(candidate["endpoints"])):
+        old = baseline["endpoints"].get(name, {})
+        new = candidate["endpoints"].get(name, {})
+        cells = []
+        for metric in METRICS:
+            delta = change(old.get(metric), new.get(metric))
+            old_text = "-" if old.get(metric) is None else f"{old[metric]:.1f}"
+            new_text = "-" if new.get(metric) is None else f"{new[metric]:.1f}"
+            delta_text = "" if delta is None else f" ({delta:+.0f}%)"
+            cells.append(f"{old_text}->{new_text}{delta_text}")
+        print(f"{name:<16}" + "".join(f"{cell:>24}" for cell in cells))
+        delta = change(old.get("p95_ms"), new.get("p95_ms"))
+        if delta is not None and delta > args.threshold:
+            regressions.append((name, delta))
+
+    for name, delta in regressions:
+        print(f"REGRESSION: {name} p95 {delta:+.1f}%")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+Synthetic data shared by the seeding script and the load test.
+"""
+
+DEFAULT_PASSWORD = "bench-password"
+USER_EMAIL_PATTERN = "bench-%@example.com"
+DEVICE_PREFIX = "bench-device-"
+
+# Smallest file the upload path accepts; the stub agent never parses it
+BENCH_PDF = b"%PDF-1.4\n1 0 obj<<>>endobj\ntrailer<<>>\n%%EOF\n"
+
+def user_email(n):
+    return f"bench-{n}@example.com"
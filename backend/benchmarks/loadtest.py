@@ -0,0 +1,268 @@
+"""
+Drive a weighted mix of API calls at fixed concurrency and report throughput
+and latency percentiles per endpoint.
+
+By default main.app is booted in-process (with its lifespan) behind the stub
+agent, so no model or embedder is called. Seed the database first:
+
+    python benchmarks/seed.py --users 1000
+    python benchmarks/loadtest.py --users 1000 --concurrency 50 --duration 60 \\
+        --output results/$(git rev-parse --short HEAD).json
+
+Use --base-url to load a running server instead; the server must then be
+started with RECOMMENDATION_AGENT=stub itself. Compare two result files with
+benchmarks/compare.py.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from fixtures import BENCH_PDF, DEFAULT_PASSWORD, user_email
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = "login=1,me=10,form_status=10,asthma_form=1,recommendations=3"
+SEVERITIES = ("mild", "moderate", "severe")
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"Unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def percentile(sorted_values, q):
+    """
+    Nearest-rank percentile of an ascending list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.recording = False
+
+    def record(self, name, seconds, status_code):
+        if self.recording:
+            self.latencies[name].append(seconds)
+            self.statuses[name][status_code] += 1
+
+    def summary(self, duration):
+        endpoints = {}
+        for name, values in sorted(self.latencies.items()):
+            values.sort()
+            statuses = self.statuses[name]
+            endpoints[name] = {
+                "requests": len(values),
+                "errors": sum(c for code, c in statuses.items() if code >= 400 or code == 0),
+                "throughput_rps": len(values) / duration,
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": values[-1] * 1000,
+                "status_codes": {str(code): c for code, c in sorted(statuses.items())},
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {
+            "requests": total,
+            "errors": sum(e["errors"] for e in endpoints.values()),
+            "throughput_rps": total / duration,
+            "endpoints": endpoints,
+        }
+
+class Session:
+    """
+    One simulated app user: logs in, then calls endpoints from the mix.
+    """
+
+    def __init__(self, client, recorder, email, password, pdf, conditional, refresh_ratio, rng):
+        self.client = client
+        self.recorder = recorder
+        self.email = email
+        self.password = password
+        self.pdf = pdf
+        self.conditional = conditional
+        self.refresh_ratio = refresh_ratio
+        self.rng = rng
+        self.headers = {}
+        self.user_id = None
+        self.etags = {}
+
+    async def timed(self, name, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status_code = response.status_code
+        except Exception as e:
+            print(f"{name} failed: {e!r}", file=sys.stderr)
+            response, status_code = None, 0
+        self.recorder.record(name, time.perf_counter() - started, status_code)
+        return response
+
+    async def login(self):
+        response = await self.timed(
+            "login", "POST", "/login", json={"email": self.email, "password": self.password}
+        )
+        if response is not None and response.status_code == 200:
+            body = response.json()
+            self.headers = {"Authorization": f"Bearer {body['access_token']}"}
+            self.user_id = body["user_id"]
+        return response
+
+    async def conditional_get(self, name, url):
+        headers = dict(self.headers)
+        if self.conditional and url in self.etags:
+            headers["If-None-Match"] = self.etags[url]
+        response = await self.timed(name, "GET", url, headers=headers)
+        if response is not None and "etag" in response.headers:
+            self.etags[url] = response.headers["etag"]
+        return response
+
+    async def me(self):
+        return await self.conditional_get("me", "/users/me")
+
+    async def form_status(self):
+        return await self.conditional_get("form_status", "/asthma-form-status")
+
+    async def asthma_form(self):
+        data = {
+            "severity": self.rng.choice(SEVERITIES),
+            "symptoms": json.dumps(["wheezing", "coughing"]),
+            "trigger_factors": json.dumps(["dust", "smoke"]),
+            "checkup_frequency": "monthly",
+        }
+        files = {"report_pdf": ("report.pdf", self.pdf, "application/pdf")}
+        return await self.timed(
+            "asthma_form", "POST", "/asthma-form", data=data, files=files, headers=self.headers
+        )
+
+    async def recommendations(self):
+        data = {"user_id": self.user_id}
+        if self.rng.random() < self.refresh_ratio:
+            data["refresh"] = "true"
+        return await self.timed("recommendations", "POST", "/get_recommendations", data=data)
+
+OPERATIONS = {
+    "login": Session.login,
+    "me": Session.me,
+    "form_status": Session.form_status,
+    "asthma_form": Session.asthma_form,
+    "recommendations": Session.recommendations,
+}
+
+async def run_session(session, mix, deadline):
+    await session.login()
+    if session.user_id is None:
+        return
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        await OPERATIONS[session.rng.choices(names, weights)[0]](session)
+
+async def run(args, client):
+    mix = parse_mix(args.mix)
+    recorder = Recorder()
+    started = time.perf_counter()
+    deadline = started + args.warmup + args.duration
+    sessions = [
+        Session(
+            client,
+            recorder,
+            user_email(n % args.users),
+            args.password,
+            BENCH_PDF,
+            args.conditional,
+            args.refresh_ratio,
+            random.Random(args.seed + n),
+        )
+        for n in range(args.concurrency)
+    ]
+    tasks = [asyncio.create_task(run_session(s, mix, deadline)) for s in sessions]
+
+    await asyncio.sleep(args.warmup)
+    recorder.recording = True
+    measured_from = time.perf_counter()
+    await asyncio.gather(*tasks)
+    recorder.recording = False
+    return recorder.summary(time.perf_counter() - measured_from)
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Load a running server instead of booting main.app in-process")
+    parser.add_argument("--users", type=int, default=1000, help="Seeded users to log in as")
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--concurrency", type=int, default=50, help="Simultaneous simulated users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Operation weights, e.g. me=10,login=1")
+    parser.add_argument("--agent-latency", type=float, default=0.5, help="Stub agent seconds per call")
+    parser.add_argument("--refresh-ratio", type=float, default=0.0,
+                        help="Share of recommendation calls that bypass the cache")
+    parser.add_argument("--conditional", action="store_true", help="Send If-None-Match with known ETags")
+    parser.add_argument("--admission", action="store_true",
+                        help="Keep admission control on; by default it is off so every session is measured")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(60.0)
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout) as client:
+            summary = await run(args, client)
+    else:
+        # Settings are read at import, so configure the stand-ins before importing the app
+        os.environ["RECOMMENDATION_AGENT"] = "stub"
+        os.environ["STUB_AGENT_LATENCY_SECONDS"] = str(args.agent_latency)
+        os.environ["REPORT_PREINGEST_ENABLED"] = "false"
+        # All sessions share one client IP, which per-IP rate limits would throttle
+        os.environ["ADMISSION_ENABLED"] = str(args.admission).lower()
+        os.chdir(BACKEND_DIR)
+        sys.path.insert(0, BACKEND_DIR)
+        import main as server
+
+        transport = httpx.ASGITransport(app=server.app)
+        async with server.lifespan(server.app):
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench", limits=limits, timeout=timeout
+            ) as client:
+                summary = await run(args, client)
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        **summary,
+    }
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+"""
+Seed a local Postgres with synthetic users, asthma_data and sensor_data for
+the load test. Uses the DB_* settings, so point them at a throwaway database:
+
+    docker run -d -p 5432:5432 -e POSTGRES_PASSWORD=bench postgres:16
+    python benchmarks/seed.py --users 1000 --devices 20 --readings 500
+
+Benchmark users are bench-<n>@example.com with the password given by
+--password and share one content-addressed report PDF. Re-running replaces
+the previous benchmark rows; other data is left alone.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.chdir(BACKEND_DIR)
+
+from app.core.config import settings  # noqa: E402
+from app.core.latest import store_latest  # noqa: E402
+from app.core.rollups import RESOLUTIONS, rollup_table, update_rollups  # noqa: E402
+from app.core.security import get_password_hash  # noqa: E402
+from app.core.uploads import report_path  # noqa: E402
+from app.db.database import close_db_pool, get_db_connection, init_db_pool  # noqa: E402
+from app.db.migrations import migrate  # noqa: E402
+from fixtures import BENCH_PDF, DEFAULT_PASSWORD, DEVICE_PREFIX, USER_EMAIL_PATTERN, user_email  # noqa: E402
+
+SEVERITIES = ("mild", "moderate", "severe")
+SYMPTOMS = ("wheezing", "coughing", "chest tightness", "shortness of breath")
+TRIGGERS = ("dust", "pollen", "smoke", "cold air", "exercise")
+
+def write_bench_pdf():
+    """
+    Store the shared benchmark report and return its public URL.
+    """
+    digest = hashlib.sha256(BENCH_PDF).hexdigest()
+    path = report_path(settings.REPORT_UPLOAD_DIR, digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(BENCH_PDF)
+    return "/" + path.replace(os.sep, "/")
+
+async def seed_users(conn, count, password, report_url, rng):
+    await conn.execute(
+        "DELETE FROM asthma_data WHERE user_id IN (SELECT id FROM users WHERE email LIKE $1)",
+        USER_EMAIL_PATTERN,
+    )
+    await conn.execute("DELETE FROM users WHERE email LIKE $1", USER_EMAIL_PATTERN)
+    # Every user shares one password, so hash it once
+    hashed_password = get_password_hash(password)
+    users = [
+        (str(uuid.uuid4()), f"bench-{n}", user_email(n), hashed_password, False)
+        for n in range(count)
+    ]
+    await conn.copy_records_to_table(
+        "users",
+        records=users,
+        columns=("id", "username", "email", "hashed_password", "disabled"),
+    )
+    now = datetime.now(timezone.utc)
+    forms = [
+        (
+            user[0],
+            rng.choice(SEVERITIES),
+            rng.sample(SYMPTOMS, 2),
+            rng.sample(TRIGGERS, 2),
+            None,
+            "monthly",
+            now - timedelta(days=rng.randint(1, 365)),
+            report_url,
+        )
+        for user in users
+    ]
+    await conn.copy_records_to_table(
+        "asthma_data",
+        records=forms,
+        columns=(
+            "user_id", "severity", "symptoms", "trigger_factors", "allergies",
+            "checkup_frequency", "last_attack_date", "report_pdf_url",
+        ),
+    )
+
+async def seed_sensors(conn, devices, readings, rng):
+    for table in ["sensor_data", "sensor_latest"] + [rollup_table(name) for name, _, _ in RESOLUTIONS]:
+        await conn.execute(f"DELETE FROM {table} WHERE device_id LIKE $1", f"{DEVICE_PREFIX}%")
+
+    interval = timedelta(seconds=settings.SENSOR_INTERVAL_SECONDS)
+    start = datetime.now(timezone.utc) - interval * readings
+    records = []
+    for d in range(devices):
+        latitude = 19.0 + rng.uniform(-0.3, 0.3)
+        longitude = 72.85 + rng.uniform(-0.3, 0.3)
+        pm2_5 = rng.uniform(20, 120)
+        for i in range(readings):
+            # Random walk so rollups and forecasts see plausible series
+            pm2_5 = max(0.0, pm2_5 + rng.gauss(0, 3))
+            records.append((
+                f"{DEVICE_PREFIX}{d}",
+                start + interval * i,
+                pm2_5 * 0.6,
+                pm2_5,
+                pm2_5 * 1.6,
+                rng.uniform(10, 80),
+                latitude,
+                longitude,
+            ))
+    columns = ("device_id", "timestamp", "pm1_0", "pm2_5", "pm10", "no2", "latitude", "longitude")
+    await conn.copy_records_to_table("sensor_data", records=records, columns=columns)
+    await update_rollups(conn, records)
+    await store_latest(conn, records)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--password", default=DEFAULT_PASSWORD)
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--readings", type=int, default=500, help="Readings per device")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report_url = write_bench_pdf()
+    await init_db_pool()
+    try:
+        await migrate()
+        async with get_db_connection() as conn:
+            async with conn.transaction():
+                await seed_users(conn, args.users, args.password, report_url, rng)
+                await seed_sensors(conn, args.devices, args.readings, rng)
+    finally:
+        await close_db_pool()
+    print(
+        f"Seeded {args.users} users and {args.devices} devices x {args.readings} readings; "
+        f"report at {report_url}"
+    )
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+"""
+Startup benchmark: cold import time of the app and time-to-first-request.
+
+Run from the backend folder with the same environment the server uses:
+
+    python benchmarks/startup.py --runs 5 --output startup.json
+
+Each run starts a fresh interpreter so nothing is served from sys.modules.
+Time-to-first-request spawns uvicorn and polls GET / until it answers; it
+needs the database to be reachable because the lifespan opens the pool.
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\| (.+)")
+
+def measure_import(module, top):
+    """
+    Import ``module`` in a fresh interpreter with -X importtime.
+
+    Returns:
+        dict: Wall-clock seconds and the slowest third-party packages and
+        app modules by cumulative import time.
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            name = match.group(3).strip()
+            # Top-level packages and our own modules; submodules roll up into them
+            if name != module and ("." not in name or name.startswith("app.")):
+                cumulative[name] = int(match.group(2)) / 1e6
+    slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {"seconds": elapsed, "slowest": slowest}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def measure_first_request(app, path, timeout):
+    """
+    Start uvicorn and time how long until ``path`` answers.
+
+    Returns:
+        float: Seconds from spawning the server to the first response.
+    """
+    port = free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited during startup:\n{server.stderr.read()[-2000:]}")
+            try:
+                with urllib.request.urlopen(url, timeout=1):
+                    return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.02)
+        raise RuntimeError(f"No response from {url} within {timeout}s")
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+def summarize(samples):
+    return {
+        "runs": len(samples),
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "max": max(samples),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--module", default="main", help="Module whose cold import is timed")
+    parser.add_argument("--app", default="main:app", help="ASGI app passed to uvicorn")
+    parser.add_argument("--path", default="/", help="Path requested to detect readiness")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--top", type=int, default=15, help="Slowest imports to report")
+    parser.add_argument("--skip-server", action="store_true", help="Only measure import time")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    imports = [measure_import(args.module, args.top) for _ in range(args.runs)]
+    results = {
+        "python": sys.version.split()[0],
+        "import": {
+            **summarize([run["seconds"] for run in imports]),
+            "slowest": imports[-1]["slowest"],
+        },
+    }
+    if not args.skip_server:
+        results["first_request"] = summarize(
+            [measure_first_request(args.app, args.path, args.timeout) for _ in range(args.runs)]
+        )
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,71 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
 from app.api.v1.api import api_router
+from app.db.database import init_db_pool, close_db_pool
+from app.db.migrations import migrate
+from app.core.latest import latest_readings
+from app.core.retention import ingest_key_sweeper
+from app.core.forecast import forecaster
+from app.core.alerts import alert_engine
+from app.core.waqi import waqi_proxy
+from app.core.security import shutdown_password_executor
+from app.api.v1.endpoints.recommend import recommendation_jobs, recommendation_precompute
+from app.core.ingestion import report_ingestion, warm_up
+from app.core.knowledge import remove_public_chunks
+from app.core.metrics import MetricsMiddleware
+from app.core.uploads import MULTIPART_OVERHEAD_BYTES, RequestSizeLimitMiddleware
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the shared database pool before serving and close it on shutdown
+    await init_db_pool()
+    await migrate()
+    await latest_readings.start(settings.LATEST_READINGS_REFRESH_SECONDS)
+    await ingest_key_sweeper.start(settings.SENSOR_IDEMPOTENCY_SWEEP_SECONDS)
+    await asyncio.to_thread(forecaster.load)
+    await alert_engine.start(settings.ALERT_RELOAD_SECONDS)
+    await waqi_proxy.start()
+    await recommendation_jobs.start()
+    # Extracted report text no longer lives under static/; drop old copies
+    removed = await asyncio.to_thread(remove_public_chunks, settings.REPORT_UPLOAD_DIR)
+    if removed:
+        print(f"Removed {removed} report chunk file(s) from {settings.REPORT_UPLOAD_DIR}")
+    await report_ingestion.start()
+    # Keep boot fast: the AI stack loads in the background or on first use
+    warmup = None
+    if settings.AI_WARMUP_ON_STARTUP and settings.RECOMMENDATION_AGENT != "stub":
+        warmup = asyncio.create_task(asyncio.to_thread(warm_up))
+    try:
+        yield
+    finally:
+        if warmup is not None:
+            await asyncio.gather(warmup, return_exceptions=True)
+        await recommendation_precompute.stop()
+        await recommendation_jobs.stop()
+        await report_ingestion.stop()
+        await waqi_proxy.close()
+        await latest_readings.stop()
+        await alert_engine.stop()
+        await ingest_key_sweeper.stop()
+        await close_db_pool()
+        shutdown_password_executor()
+
+app = FastAPI(lifespan=lifespan)
 
 # Mount static files directory
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Refuse oversized report uploads before they are parsed and spooled to
+# disk; added before CORS so the 413 still carries CORS headers
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    limits={"/asthma-form": settings.REPORT_MAX_BYTES + MULTIPART_OVERHEAD_BYTES},
+)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -18,6 +75,10 @@ app.add_middleware(
     allow_headers=settings.CORS_HEADERS,
 )
 
+# Record per-route latency; added last so it also times the CORS layer
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include API router
 app.include_router(api_router)
 
@@ -0,0 +1,55 @@
+"""
+Precompute recommendations for every user with an asthma profile and store
+them for instant reads:
+
+    python precompute.py                 # resume the last interrupted run, if any
+    python precompute.py --no-resume     # start over from the first user
+    python precompute.py --force --concurrency 4
+
+Only one run proceeds at a time across this CLI and the admin endpoint.
+Stop it with Ctrl+C; the next invocation resumes from the last stored page.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--force", action="store_true", help="Regenerate even when stored results are current")
+    parser.add_argument("--no-resume", dest="resume", action="store_false", help="Ignore unfinished runs")
+    parser.add_argument("--concurrency", type=int, help="Users generated at once (default PRECOMPUTE_CONCURRENCY)")
+    parser.add_argument("--page-size", type=int, help="Users per checkpointed page (default PRECOMPUTE_PAGE_SIZE)")
+    args = parser.parse_args()
+
+    # Settings are read at import; this process serves no requests, so the
+    # whole model budget goes to the batch
+    if args.concurrency:
+        os.environ["PRECOMPUTE_CONCURRENCY"] = str(args.concurrency)
+        os.environ["RECOMMENDATION_MODEL_CONCURRENCY"] = str(args.concurrency)
+    if args.page_size:
+        os.environ["PRECOMPUTE_PAGE_SIZE"] = str(args.page_size)
+    # Report URLs are resolved relative to the backend directory
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+
+    from fastapi import HTTPException
+    from app.api.v1.endpoints.recommend import recommendation_precompute
+    from app.db.database import close_db_pool, init_db_pool
+    from app.db.migrations import migrate
+
+    await init_db_pool()
+    try:
+        await migrate()
+        run = await recommendation_precompute.run(force=args.force, resume=args.resume)
+    except HTTPException as e:
+        sys.exit(e.detail)
+    finally:
+        await close_db_pool()
+    print(json.dumps(run, indent=2, default=str))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,19 @@
+import os
+import sys
+
+# Settings are read at import; give the required ones harmless values so
+# modules can be imported without a .env
+for name, value in {
+    "DB_NAME": "airqi_test",
+    "DB_USER": "airqi",
+    "DB_PASSWORD": "airqi",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "JWT_SECRET": "test-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+}.items():
+    os.environ.setdefault(name, value)
+
+# Run from backend/ or the repository root: tests import the app package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,61 @@
+from app.core.alerts import AlertEngine
+
+THRESHOLDS = {"mild": 200, "moderate": 150, "severe": 100}
+
+def make_engine(cooldown_seconds=1800):
+    engine = AlertEngine(THRESHOLDS, cooldown_seconds)
+    engine.set_user("alice", "severe")
+    engine.set_devices("alice", ["device-a"])
+    engine.set_user("bob", "severe")
+    engine.set_devices("bob", ["device-b"])
+    return engine
+
+def reading(device_id, pm2_5):
+    return {"device_id": device_id, "timestamp": None, "pm2_5": pm2_5}
+
+def alerted(events):
+    return sorted((event["user_id"], event["device_id"]) for event in events)
+
+def test_reading_alerts_only_followers_of_its_device():
+    engine = make_engine()
+    events = engine.evaluate([reading("device-a", 300.0), reading("device-b", 10.0)], now=1000)
+    assert alerted(events) == [("alice", "device-a")]
+    assert engine.recent("bob") == []
+
+def test_every_device_over_threshold_in_a_batch_is_reported():
+    engine = make_engine()
+    engine.set_devices("carol", ["device-a", "device-b"])
+    events = engine.evaluate([reading("device-a", 300.0), reading("device-b", 150.0)], now=1000)
+    assert alerted(events) == [
+        ("alice", "device-a"), ("bob", "device-b"), ("carol", "device-a"), ("carol", "device-b"),
+    ]
+    by_device = {event["device_id"]: event["aqi"] for event in events}
+    assert by_device["device-a"] > by_device["device-b"]
+
+def test_threshold_follows_severity():
+    engine = make_engine()
+    engine.set_user("bob", "mild")
+    # AQI ~ 150: over the severe threshold (100), under the mild one (200)
+    engine.set_devices("bob", ["device-a"])
+    events = engine.evaluate([reading("device-a", 75.0)], now=1000)
+    assert alerted(events) == [("alice", "device-a")]
+
+def test_cooldown_is_per_user_and_device():
+    engine = make_engine()
+    engine.set_devices("alice", ["device-a", "device-b"])
+    assert alerted(engine.evaluate([reading("device-a", 150.0)], now=1000)) == [("alice", "device-a")]
+    # Same device within the cooldown and category: suppressed
+    assert engine.evaluate([reading("device-a", 150.0)], now=1100) == []
+    # Another device still alerts
+    assert alerted(engine.evaluate([reading("device-b", 150.0)], now=1100)) == [
+        ("alice", "device-b"), ("bob", "device-b"),
+    ]
+    # A worse category breaks through the cooldown
+    assert alerted(engine.evaluate([reading("device-a", 300.0)], now=1200)) == [("alice", "device-a")]
+    assert engine.evaluate([reading("device-a", 300.0)], now=1300) == []
+    assert alerted(engine.evaluate([reading("device-a", 300.0)], now=1200 + 1800)) == [("alice", "device-a")]
+
+def test_unfollowed_and_unknown_devices_do_not_alert():
+    engine = make_engine()
+    engine.set_devices("alice", [])
+    assert engine.evaluate([reading("device-a", 300.0), reading("device-z", 300.0)], now=1000) == []
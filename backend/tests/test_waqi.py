@@ -0,0 +1,143 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import HTTPException
+from app.core.waqi import WaqiProxy
+
+TTL = 60
+
+class FakeWaqi:
+    """
+    Stand-in for api.waqi.info behind an httpx.MockTransport. Answers every
+    request with the current ``aqi`` value, with ``status_code`` when it is
+    an HTTP error, or with WAQI's error payload when ``ok`` is False; while
+    ``gate`` is set, responses wait until it is opened.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.aqi = 42
+        self.status_code = 200
+        self.ok = True
+        self.gate = None
+
+    async def __call__(self, request):
+        self.calls += 1
+        assert request.url.params["token"] == "test-token"
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.status_code != 200:
+            return httpx.Response(self.status_code, text="Internal Server Error")
+        if not self.ok:
+            return httpx.Response(200, json={"status": "error", "data": "Unknown station"})
+        return httpx.Response(200, json={"status": "ok", "data": {"aqi": self.aqi}})
+
+def make_proxy(upstream):
+    return WaqiProxy(
+        "https://waqi.test", "test-token", ttl=TTL, stale_ttl=3600, maxsize=100,
+        timeout=5, max_connections=5, transport=httpx.MockTransport(upstream),
+    )
+
+def expire(proxy, key):
+    # Age the cached entry past the TTL but keep it within the stale window
+    fetched_at, data = proxy.cache.get(key)
+    proxy.cache.set(key, (fetched_at - TTL - 1, data))
+
+def run(proxy, scenario):
+    async def main():
+        await proxy.start()
+        try:
+            await scenario()
+        finally:
+            await proxy.close()
+    asyncio.run(main())
+
+def test_cache_hit_within_ttl():
+    upstream = FakeWaqi()
+    proxy = make_proxy(upstream)
+
+    async def scenario():
+        first = await proxy.station(1451)
+        upstream.aqi = 99
+        second = await proxy.station(1451)
+        assert first == second == {"aqi": 42}
+        assert upstream.calls == 1
+        assert proxy.stats()["upstream_requests"] == 1
+
+    run(proxy, scenario)
+
+def test_concurrent_misses_share_one_upstream_request():
+    upstream = FakeWaqi()
+    proxy = make_proxy(upstream)
+
+    async def scenario():
+        upstream.gate = asyncio.Event()
+        lookups = [asyncio.create_task(proxy.station(1451)) for _ in range(10)]
+        await asyncio.sleep(0)
+        upstream.gate.set()
+        results = await asyncio.gather(*lookups)
+        assert results == [{"aqi": 42}] * 10
+        assert upstream.calls == 1
+        assert proxy.coalesced == 9
+
+    run(proxy, scenario)
+
+def test_stale_entry_served_while_revalidating():
+    upstream = FakeWaqi()
+    proxy = make_proxy(upstream)
+
+    async def scenario():
+        await proxy.station(1451)
+        expire(proxy, "station:1451")
+        upstream.aqi = 99
+        upstream.gate = asyncio.Event()
+
+        # Served from cache at once while one refresh runs in the background
+        assert await proxy.station(1451) == {"aqi": 42}
+        assert await proxy.station(1451) == {"aqi": 42}
+        refresh = proxy._in_flight["station:1451"]
+        assert proxy.stale_served == 2
+        assert proxy.coalesced == 1
+
+        upstream.gate.set()
+        await refresh
+        assert await proxy.station(1451) == {"aqi": 99}
+        assert upstream.calls == 2
+
+    run(proxy, scenario)
+
+def test_upstream_error_keeps_serving_stale_entry():
+    upstream = FakeWaqi()
+    proxy = make_proxy(upstream)
+
+    async def scenario():
+        await proxy.station(1451)
+        expire(proxy, "station:1451")
+        upstream.status_code = 500
+
+        assert await proxy.station(1451) == {"aqi": 42}
+        # The failed refresh is swallowed and the stale entry stays
+        await asyncio.gather(*proxy._in_flight.values(), return_exceptions=True)
+        assert not proxy._in_flight
+        assert upstream.calls == 2
+        assert await proxy.station(1451) == {"aqi": 42}
+
+    run(proxy, scenario)
+
+@pytest.mark.parametrize("status_code, ok", [(500, True), (200, False)])
+def test_upstream_error_without_cached_entry_is_502(status_code, ok):
+    upstream = FakeWaqi()
+    proxy = make_proxy(upstream)
+
+    async def scenario():
+        upstream.status_code, upstream.ok = status_code, ok
+        with pytest.raises(HTTPException) as error:
+            await proxy.station(1451)
+        assert error.value.status_code == 502
+
+        # Failures are not cached; the next lookup goes upstream again
+        upstream.status_code, upstream.ok = 200, True
+        assert await proxy.station(1451) == {"aqi": 42}
+        assert upstream.calls == 2
+
+    run(proxy, scenario)